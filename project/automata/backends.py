@@ -0,0 +1,296 @@
+from abc import ABC, abstractmethod
+from scipy.sparse import csr_matrix, issparse
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+import scipy.sparse as sp
+
+from project.automata import cubool_emulation
+from project.automata.bit_matrix import DENSITY_THRESHOLD, BitMatrix
+from project.automata.bit_matrix import kron as bit_kron
+
+try:
+    import pycubool
+except ImportError:
+    pycubool = None
+
+# row or column indices of the cells of a matrix
+Indices = Union[Sequence[int], np.ndarray]
+
+
+class MatrixBackend(ABC):
+    # boolean matrix operations the automata and cfpq engines are written against,
+    # results are returned and callers rebind, out= is only a hint for in-place work
+    name = ""
+
+    @abstractmethod
+    def owns(self, matrix: Any) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def empty(self, shape: Tuple[int, int]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def from_lists(self, shape: Tuple[int, int], rows: Indices, cols: Indices) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def to_lists(self, matrix: Any) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def nnz(self, matrix: Any) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def dup(self, matrix: Any) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def kron(self, left: Any, right: Any) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def mxm(
+        self, left: Any, right: Any, out: Optional[Any] = None, accumulate: bool = False
+    ) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def ewise_add(self, left: Any, right: Any) -> Any:
+        raise NotImplementedError
+
+    def identity(self, n: int) -> Any:
+        indices = np.arange(n, dtype=np.int64)
+        return self.from_lists((n, n), indices, indices)
+
+    def difference(self, left: Any, right: Any) -> Any:
+        num_cols = left.shape[1]
+        l_rows, l_cols = self.to_lists(left)
+        r_rows, r_cols = self.to_lists(right)
+        cells = np.setdiff1d(l_rows * num_cols + l_cols, r_rows * num_cols + r_cols)
+        return self.from_lists(left.shape, cells // num_cols, cells % num_cols)
+
+    def block_diag(self, left: Any, right: Any) -> Any:
+        l_rows, l_cols = self.to_lists(left)
+        r_rows, r_cols = self.to_lists(right)
+        return self.from_lists(
+            (left.shape[0] + right.shape[0], left.shape[1] + right.shape[1]),
+            np.concatenate([l_rows, r_rows + left.shape[0]]),
+            np.concatenate([l_cols, r_cols + left.shape[1]]),
+        )
+
+    def iterate(self, matrix: Any) -> Iterator[Tuple[int, int]]:
+        rows, cols = self.to_lists(matrix)
+        return zip(rows.tolist(), cols.tolist())
+
+    def to_csr(self, matrix: Any) -> csr_matrix:
+        rows, cols = self.to_lists(matrix)
+        return _csr_from_lists(matrix.shape, rows, cols)
+
+
+class ScipyBackend(MatrixBackend):
+    # written with operators only, so csr and BitMatrix operands can be mixed
+    name = "sparse"
+
+    def owns(self, matrix: Any) -> bool:
+        return bool(issparse(matrix))
+
+    def empty(self, shape: Tuple[int, int]) -> Any:
+        return csr_matrix(shape, dtype=bool)
+
+    def from_lists(self, shape: Tuple[int, int], rows: Indices, cols: Indices) -> Any:
+        return _csr_from_lists(shape, rows, cols)
+
+    def to_lists(self, matrix: Any) -> Tuple[np.ndarray, np.ndarray]:
+        rows, cols = matrix.nonzero()
+        return rows.astype(np.int64), cols.astype(np.int64)
+
+    def nnz(self, matrix: Any) -> int:
+        return int(matrix.nnz)
+
+    def dup(self, matrix: Any) -> Any:
+        return matrix.copy()
+
+    def kron(self, left: Any, right: Any) -> Any:
+        # packed only when both sides are, a sparse side keeps the product sparse
+        if isinstance(left, BitMatrix) and isinstance(right, BitMatrix):
+            return bit_kron(left, right)
+        return sp.kron(_unpacked(left), _unpacked(right), format="csr")
+
+    def mxm(
+        self, left: Any, right: Any, out: Optional[Any] = None, accumulate: bool = False
+    ) -> Any:
+        product = left @ right
+        if out is None or not accumulate:
+            return product
+
+        out += product
+        return out
+
+    def ewise_add(self, left: Any, right: Any) -> Any:
+        return left + right
+
+    def identity(self, n: int) -> Any:
+        return sp.identity(n, dtype=bool, format="csr")
+
+    def difference(self, left: Any, right: Any) -> Any:
+        return left > right
+
+    def block_diag(self, left: Any, right: Any) -> Any:
+        return sp.block_diag(
+            (to_backend(left, "sparse"), to_backend(right, "sparse")),
+            format="csr",
+            dtype=bool,
+        )
+
+    def to_csr(self, matrix: Any) -> csr_matrix:
+        if isinstance(matrix, BitMatrix):
+            return matrix.tocsr()
+
+        # csr_matrix shares the arrays of a csr input, which may be read-only maps
+        result = csr_matrix(matrix, dtype=bool)
+        if not result.data.all():
+            result = result.copy()
+            result.eliminate_zeros()
+        return result
+
+
+class BitBackend(ScipyBackend):
+    name = "dense"
+
+    def owns(self, matrix: Any) -> bool:
+        return isinstance(matrix, BitMatrix)
+
+    def empty(self, shape: Tuple[int, int]) -> Any:
+        return BitMatrix.zeros(shape)
+
+    def from_lists(self, shape: Tuple[int, int], rows: Indices, cols: Indices) -> Any:
+        return BitMatrix.from_matrix(_csr_from_lists(shape, rows, cols))
+
+    def identity(self, n: int) -> Any:
+        return BitMatrix.identity(n)
+
+    def block_diag(self, left: Any, right: Any) -> Any:
+        return BitMatrix.from_matrix(super().block_diag(left, right))
+
+
+class CuboolBackend(MatrixBackend):
+    # pycubool matrices, or their cpu emulation when emulated is set;
+    # pycubool cannot allocate matrices with a zero dimension
+    def __init__(self, emulated: bool = False):
+        if not emulated and pycubool is None:
+            raise ImportError("The cubool backend requires pycubool")
+
+        self.emulated = emulated
+        self.name = "cubool_emulated" if emulated else "cubool"
+
+    @property
+    def matrix_type(self) -> Any:
+        return cubool_emulation.Matrix if self.emulated else pycubool.Matrix
+
+    def owns(self, matrix: Any) -> bool:
+        return isinstance(matrix, self.matrix_type)
+
+    def empty(self, shape: Tuple[int, int]) -> Any:
+        return self.matrix_type.empty(shape)
+
+    def from_lists(self, shape: Tuple[int, int], rows: Indices, cols: Indices) -> Any:
+        return self.matrix_type.from_lists(
+            shape, np.asarray(rows).tolist(), np.asarray(cols).tolist()
+        )
+
+    def to_lists(self, matrix: Any) -> Tuple[np.ndarray, np.ndarray]:
+        rows, cols = matrix.to_lists()
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+    def nnz(self, matrix: Any) -> int:
+        return int(matrix.nvals)
+
+    def dup(self, matrix: Any) -> Any:
+        return matrix.dup()
+
+    def kron(self, left: Any, right: Any) -> Any:
+        return left.kronecker(right)
+
+    def mxm(
+        self, left: Any, right: Any, out: Optional[Any] = None, accumulate: bool = False
+    ) -> Any:
+        if out is None:
+            return left.mxm(right)
+        return left.mxm(right, out=out, accumulate=accumulate)
+
+    def ewise_add(self, left: Any, right: Any) -> Any:
+        return left.ewiseadd(right)
+
+
+_BACKENDS: Dict[str, MatrixBackend] = {
+    backend.name: backend
+    for backend in (
+        ScipyBackend(),
+        BitBackend(),
+        CuboolBackend(emulated=True),
+    )
+}
+if pycubool is not None:
+    _BACKENDS["cubool"] = CuboolBackend()
+
+
+def get_backend(name: str) -> MatrixBackend:
+    # "auto" mixes csr and BitMatrix, which the scipy backend handles through operators
+    if name == "auto":
+        return _BACKENDS["sparse"]
+    if name == "cubool" and name not in _BACKENDS:
+        raise ImportError("The cubool backend requires pycubool")
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown matrix backend: {name}")
+
+    return _BACKENDS[name]
+
+
+def backend_of(matrix: Any) -> MatrixBackend:
+    for name in ("dense", "cubool_emulated", "cubool"):
+        if name in _BACKENDS and _BACKENDS[name].owns(matrix):
+            return _BACKENDS[name]
+
+    return _BACKENDS["sparse"]
+
+
+def to_backend(matrix: Any, name: str = "auto") -> Any:
+    # "dense" packs bits, "sparse" is csr, "auto" chooses between them by density
+    source = backend_of(matrix)
+    if name == "auto":
+        name = (
+            "dense"
+            if source.nnz(matrix) > DENSITY_THRESHOLD * _num_cells(matrix)
+            else "sparse"
+        )
+
+    target = get_backend(name)
+    if target.owns(matrix):
+        return matrix
+    if name == "dense" and source.name == "sparse":
+        return BitMatrix.from_matrix(matrix)
+    if name == "sparse":
+        return source.to_csr(matrix)
+
+    return target.from_lists(matrix.shape, *source.to_lists(matrix))
+
+
+def _unpacked(matrix: Any) -> Any:
+    return matrix.tocsr() if isinstance(matrix, BitMatrix) else matrix
+
+
+def _num_cells(matrix: Any) -> int:
+    return int(matrix.shape[0] * matrix.shape[1])
+
+
+def _csr_from_lists(shape: Tuple[int, int], rows: Indices, cols: Indices) -> csr_matrix:
+    return csr_matrix(
+        (
+            np.ones(len(rows), dtype=bool),
+            (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)),
+        ),
+        shape=shape,
+        dtype=bool,
+    )
@@ -0,0 +1,164 @@
+from scipy.sparse import csr_matrix, issparse
+from typing import Any, Tuple
+import numpy as np
+
+# relations filled above this share of their cells are stored bit-packed
+DENSITY_THRESHOLD = 0.05
+
+
+class BitMatrix:
+    # boolean matrix with rows packed into uint64 words, bit j of a row is column j
+    __array_priority__ = 100
+
+    def __init__(self, bits: np.ndarray, shape: Tuple[int, int]):
+        self.bits = bits
+        self.shape = shape
+
+    @staticmethod
+    def zeros(shape: Tuple[int, int]) -> "BitMatrix":
+        return BitMatrix(np.zeros((shape[0], _num_words(shape[1])), np.uint64), shape)
+
+    @staticmethod
+    def identity(n: int) -> "BitMatrix":
+        return BitMatrix.from_dense(np.eye(n, dtype=bool))
+
+    @staticmethod
+    def from_dense(dense: np.ndarray) -> "BitMatrix":
+        dense = np.asarray(dense, dtype=bool)
+        num_rows, num_cols = dense.shape
+        padded = np.zeros((num_rows, _num_words(num_cols) * 64), dtype=bool)
+        padded[:, :num_cols] = dense
+        packed = np.packbits(padded, axis=1, bitorder="little")
+        return BitMatrix(
+            np.ascontiguousarray(packed)
+            .view(np.uint64)
+            .reshape(num_rows, _num_words(num_cols)),
+            (num_rows, num_cols),
+        )
+
+    @staticmethod
+    def from_matrix(matrix: Any) -> "BitMatrix":
+        if isinstance(matrix, BitMatrix):
+            return matrix
+
+        matrix = csr_matrix(matrix, dtype=bool)
+        matrix.eliminate_zeros()
+        rows, cols = matrix.nonzero()
+        result = BitMatrix.zeros(matrix.shape)
+        np.bitwise_or.at(
+            result.bits,
+            (rows, cols // 64),
+            np.left_shift(np.uint64(1), (cols % 64).astype(np.uint64)),
+        )
+        return result
+
+    def to_dense(self) -> np.ndarray:
+        unpacked = np.unpackbits(_as_bytes(self.bits), axis=1, bitorder="little")
+        return unpacked[:, : self.shape[1]].astype(bool)
+
+    def tocsr(self) -> csr_matrix:
+        rows, cols = self.nonzero()
+        return csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)), shape=self.shape, dtype=bool
+        )
+
+    def nonzero(self) -> Tuple[np.ndarray, np.ndarray]:
+        rows, cols = np.nonzero(self.to_dense())
+        return rows, cols
+
+    @property
+    def nnz(self) -> int:
+        return int(_popcount(self.bits).sum())
+
+    @property
+    def T(self) -> "BitMatrix":
+        return BitMatrix.from_dense(self.to_dense().T)
+
+    def copy(self) -> "BitMatrix":
+        return BitMatrix(self.bits.copy(), self.shape)
+
+    def __add__(self, other: Any) -> "BitMatrix":
+        return BitMatrix(self.bits | _coerce(other).bits, self.shape)
+
+    __radd__ = __add__
+    __or__ = __add__
+    __ror__ = __add__
+
+    def __iadd__(self, other: Any) -> "BitMatrix":
+        self.bits |= _coerce(other).bits
+        return self
+
+    def __and__(self, other: Any) -> "BitMatrix":
+        return BitMatrix(self.bits & _coerce(other).bits, self.shape)
+
+    __rand__ = __and__
+
+    def __gt__(self, other: Any) -> "BitMatrix":
+        # set difference, as in csr_matrix comparisons of boolean matrices
+        return BitMatrix(self.bits & ~_coerce(other).bits, self.shape)
+
+    def __lt__(self, other: Any) -> "BitMatrix":
+        return BitMatrix(_coerce(other).bits & ~self.bits, self.shape)
+
+    def __matmul__(self, other: Any) -> "BitMatrix":
+        return _matmul(self, _coerce(other))
+
+    def __rmatmul__(self, other: Any) -> "BitMatrix":
+        return _matmul(_coerce(other), self)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, BitMatrix) and not issparse(other):
+            return NotImplemented
+        other = _coerce(other)
+        return self.shape == other.shape and np.array_equal(self.bits, other.bits)
+
+    def __repr__(self) -> str:
+        return f"BitMatrix(shape={self.shape}, nnz={self.nnz})"
+
+
+def kron(left: BitMatrix, right: BitMatrix) -> BitMatrix:
+    # only for two packed operands, a sparse one would be densified to (N * M)^2
+    return BitMatrix.from_dense(np.kron(left.to_dense(), right.to_dense()))
+
+
+def _num_words(num_cols: int) -> int:
+    return max(1, -(-num_cols // 64))
+
+
+def _coerce(matrix: Any) -> BitMatrix:
+    return matrix if isinstance(matrix, BitMatrix) else BitMatrix.from_matrix(matrix)
+
+
+def _as_bytes(bits: np.ndarray) -> np.ndarray:
+    return bits.view(np.uint8).reshape(bits.shape[0], bits.shape[1] * 8)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.asarray(np.bitwise_count(bits))
+    return np.asarray(
+        np.unpackbits(bits.view(np.uint8)).reshape(*bits.shape, 64).sum(axis=-1)
+    )
+
+
+def _matmul(left: BitMatrix, right: BitMatrix) -> BitMatrix:
+    # method of four russians: rows of the result are ORs of right's rows
+    # selected by 8-bit chunks of left's rows, all 256 ORs are tabulated per chunk
+    if left.shape[1] != right.shape[0]:
+        raise ValueError(f"Shapes do not match: {left.shape} @ {right.shape}")
+
+    result = BitMatrix.zeros((left.shape[0], right.shape[1]))
+    left_bytes = _as_bytes(left.bits)
+    table = np.zeros((256, right.bits.shape[1]), dtype=np.uint64)
+    for chunk in range(-(-left.shape[1] // 8)):
+        chunk_bytes = left_bytes[:, chunk]
+        if not chunk_bytes.any():
+            continue
+
+        rows = right.bits[8 * chunk : 8 * chunk + 8]
+        table[1:] = 0
+        for bit in range(len(rows)):
+            table[1 << bit : 2 << bit] = table[: 1 << bit] | rows[bit]
+        result.bits |= table[chunk_bytes]
+
+    return result
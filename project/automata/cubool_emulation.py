@@ -0,0 +1,89 @@
+from scipy.sparse import csr_matrix, kron
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class Matrix:
+    # cpu stand-in for the subset of pycubool.Matrix used by the backends
+    def __init__(self, matrix: csr_matrix):
+        self.matrix = matrix
+
+    @staticmethod
+    def empty(shape: Tuple[int, int]) -> "Matrix":
+        return Matrix(csr_matrix(shape, dtype=bool))
+
+    @staticmethod
+    def from_lists(
+        shape: Tuple[int, int],
+        rows: Sequence[int],
+        cols: Sequence[int],
+        is_sorted: bool = False,
+        no_duplicates: bool = False,
+    ) -> "Matrix":
+        return Matrix(
+            csr_matrix(
+                (
+                    np.ones(len(rows), dtype=bool),
+                    (
+                        np.asarray(rows, dtype=np.int64),
+                        np.asarray(cols, dtype=np.int64),
+                    ),
+                ),
+                shape=shape,
+                dtype=bool,
+            )
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return int(self.matrix.shape[0]), int(self.matrix.shape[1])
+
+    @property
+    def nrows(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @property
+    def ncols(self) -> int:
+        return int(self.matrix.shape[1])
+
+    @property
+    def nvals(self) -> int:
+        return int(self.matrix.nnz)
+
+    def dup(self) -> "Matrix":
+        return Matrix(self.matrix.copy())
+
+    def to_lists(self) -> Tuple[List[int], List[int]]:
+        rows, cols = self.matrix.nonzero()
+        return rows.tolist(), cols.tolist()
+
+    def transpose(self) -> "Matrix":
+        return Matrix(self.matrix.T.tocsr())
+
+    def mxm(
+        self, other: "Matrix", out: Optional["Matrix"] = None, accumulate: bool = False
+    ) -> "Matrix":
+        return _store(self.matrix @ other.matrix, out, accumulate)
+
+    def ewiseadd(self, other: "Matrix", out: Optional["Matrix"] = None) -> "Matrix":
+        return _store(self.matrix + other.matrix, out, False)
+
+    def kronecker(self, other: "Matrix", out: Optional["Matrix"] = None) -> "Matrix":
+        return _store(kron(self.matrix, other.matrix, format="csr"), out, False)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(*self.to_lists())
+
+    def __setitem__(self, key: Tuple[int, int], value: bool) -> None:
+        row, col = key
+        self.matrix = self.matrix + csr_matrix(
+            ([bool(value)], ([row], [col])), shape=self.shape, dtype=bool
+        )
+
+
+def _store(result: csr_matrix, out: Optional[Matrix], accumulate: bool) -> Matrix:
+    if out is None:
+        return Matrix(result)
+
+    out.matrix = out.matrix + result if accumulate else result
+    return out
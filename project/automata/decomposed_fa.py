@@ -3,23 +3,54 @@ from pyformlang.finite_automaton import (
     NondeterministicFiniteAutomaton,
     State,
 )
-from scipy.sparse import csr_matrix, kron, block_diag
+from scipy.sparse import csr_matrix
+from project.automata.backends import (
+    MatrixBackend,
+    backend_of,
+    get_backend,
+    to_backend,
+)
 from project.automata.rsm import RecursiveStateMachine
+from project.graphs.labeled_graph import (
+    LabeledGraph,
+    edges_by_label,
+    node_indices,
+)
+from project.parallel.executor import LabelExecutor, get_executor
+from project.instrumentation.counters import count_iteration
 
-from typing import Dict, Any
+from collections import defaultdict
+from copy import copy
+from itertools import repeat
+from networkx import MultiDiGraph
+from typing import (
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+import numpy as np
 
 
 class DecomposedFA:
-    def __init__(self):
-        self.matrices = dict()
-        self.start_states = set()
-        self.final_states = set()
-        self.states_with_indices = dict()
+    def __init__(self, backend: str = "sparse"):
+        self.backend: MatrixBackend = get_backend(backend)
+        self.matrices: Dict[Any, Any] = dict()
+        self.start_states: Set[Any] = set()
+        self.final_states: Set[Any] = set()
+        self.states_with_indices: Mapping[Any, int] = dict()
         self.num_states = 0
 
     @staticmethod
-    def from_fa(finite_automaton: FiniteAutomaton) -> "DecomposedFA":
-        result = DecomposedFA()
+    def from_fa(
+        finite_automaton: FiniteAutomaton, backend: str = "sparse"
+    ) -> "DecomposedFA":
+        result = DecomposedFA(backend)
         result.start_states = finite_automaton.start_states
         result.final_states = finite_automaton.final_states
         result.num_states = len(finite_automaton.states)
@@ -27,20 +58,45 @@ class DecomposedFA:
             zip(finite_automaton.states, range(result.num_states))
         )
 
-        for s_from, label, s_to in finite_automaton:
-            if label not in result.matrices:
-                result.matrices[label] = csr_matrix(
-                    (result.num_states, result.num_states), dtype=bool
+        result.matrices = _matrices_from_transitions(
+            result.backend,
+            result.num_states,
+            (
+                (
+                    result.states_with_indices[s_from],
+                    label,
+                    result.states_with_indices[s_to],
                 )
-            result.matrices[label][
-                result.states_with_indices[s_from], result.states_with_indices[s_to]
-            ] = True
+                for s_from, label, s_to in finite_automaton
+            ),
+        )
 
         return result
 
     @staticmethod
-    def from_rsm(rsm: RecursiveStateMachine) -> "DecomposedFA":
-        result = DecomposedFA()
+    def from_graph(
+        graph: Union[MultiDiGraph, LabeledGraph],
+        start_states: Set = set(),
+        final_states: Set = set(),
+        backend: str = "sparse",
+    ) -> "DecomposedFA":
+        result = DecomposedFA(backend)
+        result.num_states = graph.number_of_nodes()
+        result.states_with_indices = node_indices(graph)
+        result.start_states = set(start_states) if start_states else set(graph.nodes)
+        result.final_states = set(final_states) if final_states else set(graph.nodes)
+
+        shape = (result.num_states, result.num_states)
+        result.matrices = {
+            label: result.backend.from_lists(shape, rows, cols)
+            for label, (rows, cols) in edges_by_label(graph).items()
+        }
+
+        return result
+
+    @staticmethod
+    def from_rsm(rsm: RecursiveStateMachine, backend: str = "sparse") -> "DecomposedFA":
+        result = DecomposedFA(backend)
         states = set()
         result.start_states = set()
         result.final_states = set()
@@ -56,26 +112,50 @@ class DecomposedFA:
 
         result.num_states = len(states)
         result.states_with_indices = dict(zip(states, range(result.num_states)))
-        for variable, dfa in rsm.automata.items():
-            for s_from, label, s_to in dfa:
-                if label not in result.matrices:
-                    result.matrices[label] = csr_matrix(
-                        (result.num_states, result.num_states), dtype=bool
-                    )
-
-                result.matrices[label][
+        result.matrices = _matrices_from_transitions(
+            result.backend,
+            result.num_states,
+            (
+                (
                     result.states_with_indices[State((variable, s_from.value))],
+                    label,
                     result.states_with_indices[State((variable, s_to.value))],
-                ] = True
+                )
+                for variable, dfa in rsm.automata.items()
+                for s_from, label, s_to in dfa
+            ),
+        )
+
+        return result
+
+    def with_states(
+        self, start_states: Set = set(), final_states: Set = set()
+    ) -> "DecomposedFA":
+        # shares the matrices, empty sets keep the current states
+        result = copy(self)
+        if start_states:
+            result.start_states = set(start_states)
+        if final_states:
+            result.final_states = set(final_states)
+        return result
 
+    def with_backend(self, backend: str = "auto") -> "DecomposedFA":
+        result = copy(self)
+        result.backend = get_backend(backend)
+        result.matrices = {
+            label: to_backend(matrix, backend)
+            for label, matrix in self.matrices.items()
+        }
         return result
 
     def to_fa(self) -> NondeterministicFiniteAutomaton:
         result = NondeterministicFiniteAutomaton()
 
+        states_by_indices = {i: state for state, i in self.states_with_indices.items()}
         for label in self.matrices:
             result.add_transitions(
-                map(lambda x: (x[0], label, x[1]), zip(*self.matrices[label].nonzero()))
+                (states_by_indices[i], label, states_by_indices[j])
+                for i, j in self.backend.iterate(self.matrices[label])
             )
 
         for state in self.start_states:
@@ -86,56 +166,272 @@ class DecomposedFA:
 
         return result
 
-    def intersect(self, other: "DecomposedFA") -> "DecomposedFA":
+    def intersect(
+        self,
+        other: "DecomposedFA",
+        reachable_only: bool = False,
+        executor: Optional[LabelExecutor] = None,
+    ) -> "DecomposedFA":
+        if reachable_only:
+            return self._reachable_intersect(other, executor or get_executor())
+
         result = DecomposedFA()
+        result.backend = self.backend
 
-        for label in self.matrices.keys() & other.matrices.keys():
-            result.matrices[label] = kron(self.matrices[label], other.matrices[label])
+        labels = list(self.matrices.keys() & other.matrices.keys())
+        result.matrices = dict(
+            zip(
+                labels,
+                (executor or get_executor()).map(
+                    self.backend.kron,
+                    [self.matrices[label] for label in labels],
+                    [other.matrices[label] for label in labels],
+                ),
+            )
+        )
 
-        for self_index, self_state in enumerate(self.states_with_indices.keys()):
-            for other_index, other_state in enumerate(other.states_with_indices.keys()):
-                result_state = self_index * other.num_states + other_index
-                result.states_with_indices[result_state] = result_state
+        result.num_states = self.num_states * other.num_states
+        result.states_with_indices = IndexMapping(result.num_states)
+        result.start_states = set(
+            pair_indices(
+                state_indices(self.states_with_indices, self.start_states),
+                state_indices(other.states_with_indices, other.start_states),
+                other.num_states,
+            ).tolist()
+        )
+        result.final_states = set(
+            pair_indices(
+                state_indices(self.states_with_indices, self.final_states),
+                state_indices(other.states_with_indices, other.final_states),
+                other.num_states,
+            ).tolist()
+        )
 
-                if (
-                    self_state in self.start_states
-                    and other_state in other.start_states
-                ):
-                    result.start_states.add(result_state)
+        return result
 
-                if (
-                    self_state in self.final_states
-                    and other_state in other.final_states
-                ):
-                    result.final_states.add(result_state)
+    def _reachable_intersect(
+        self, other: "DecomposedFA", executor: LabelExecutor
+    ) -> "DecomposedFA":
+        labels = list(self.matrices.keys() & other.matrices.keys())
+        self_matrices = [self.backend.to_csr(self.matrices[label]) for label in labels]
+        other_matrices = [
+            other.backend.to_csr(other.matrices[label]) for label in labels
+        ]
+        self_start = state_indices(self.states_with_indices, self.start_states)
+        other_start = state_indices(other.states_with_indices, other.start_states)
 
-        result.num_states = self.num_states * other.num_states
-        return result
+        # product states are numbered as in the full intersection
+        # but only those reachable from the start pairs are materialized
+        visited = pair_indices(self_start, other_start, other.num_states)
+        frontier = visited
+        while len(frontier) > 0:
+            count_iteration("intersect.reachable", len(visited))
+            self_from, other_from = np.divmod(frontier, other.num_states)
+            successors = [
+                pair_to
+                for _, pair_to in executor.map(
+                    _successor_pairs,
+                    repeat(self_from),
+                    repeat(other_from),
+                    self_matrices,
+                    other_matrices,
+                    repeat(other.num_states),
+                )
+            ]
+            successors.append(np.empty(0, dtype=np.int64))
+            frontier = np.setdiff1d(
+                np.concatenate(successors), visited, assume_unique=False
+            )
+            visited = np.union1d(visited, frontier)
 
-    def transitive_closure(self) -> csr_matrix:
-        if self.num_states == 0:
-            return csr_matrix((0, 0), dtype=bool)
+        result = DecomposedFA()
+        result.backend = self.backend
+        result.num_states = len(visited)
+        result.states_with_indices = dict(
+            zip(visited.tolist(), range(result.num_states))
+        )
 
-        result = sum(self.matrices.values())
+        self_from, other_from = np.divmod(visited, other.num_states)
+        for label, (pair_from, pair_to) in zip(
+            labels,
+            executor.map(
+                _successor_pairs,
+                repeat(self_from),
+                repeat(other_from),
+                self_matrices,
+                other_matrices,
+                repeat(other.num_states),
+            ),
+        ):
+            result.matrices[label] = self.backend.from_lists(
+                (result.num_states, result.num_states),
+                pair_from,
+                np.searchsorted(visited, pair_to),
+            )
 
-        for _ in range(self.num_states):
-            result += result @ result
+        result.start_states = set(
+            pair_indices(self_start, other_start, other.num_states).tolist()
+        )
+        is_final = (
+            indicator(
+                state_indices(self.states_with_indices, self.final_states),
+                self.num_states,
+            )[self_from]
+            & indicator(
+                state_indices(other.states_with_indices, other.final_states),
+                other.num_states,
+            )[other_from]
+        )
+        result.final_states = set(visited[is_final].tolist())
 
         return result
 
-    def direct_sum(self, other: "DecomposedFA") -> Dict[Any, csr_matrix]:
-        result = dict()
+    def transitive_closure(
+        self, strategy: str = "squaring", backend: Optional[str] = None
+    ) -> Any:
+        adjacency = self.backend.empty((self.num_states, self.num_states))
+        for matrix in self.matrices.values():
+            adjacency = self.backend.ewise_add(adjacency, matrix)
+        if backend is not None:
+            adjacency = to_backend(adjacency, backend)
 
-        for label in self.matrices.keys() | other.matrices.keys():
-            self_matrix = self.matrices.get(
-                label, csr_matrix((self.num_states, self.num_states), dtype=bool)
+        if strategy == "squaring":
+            return _squaring_closure(backend_of(adjacency), adjacency)
+        if strategy == "frontier":
+            return _frontier_closure(backend_of(adjacency), adjacency)
+
+        raise ValueError(f"Unknown transitive closure strategy: {strategy}")
+
+    def direct_sum(
+        self, other: "DecomposedFA", executor: Optional[LabelExecutor] = None
+    ) -> Dict[Any, Any]:
+        labels = list(self.matrices.keys() | other.matrices.keys())
+        self_matrices = [
+            self.matrices.get(
+                label, self.backend.empty((self.num_states, self.num_states))
             )
-            other_matrix = other.matrices.get(
-                label, csr_matrix((other.num_states, other.num_states), dtype=bool)
+            for label in labels
+        ]
+        other_matrices = [
+            to_backend(
+                other.matrices.get(
+                    label, other.backend.empty((other.num_states, other.num_states))
+                ),
+                self.backend.name,
             )
+            for label in labels
+        ]
 
-            result[label] = block_diag(
-                (self_matrix, other_matrix), format="csr", dtype=bool
+        return dict(
+            zip(
+                labels,
+                (executor or get_executor()).map(
+                    self.backend.block_diag, self_matrices, other_matrices
+                ),
             )
+        )
 
-        return result
+
+def _matrices_from_transitions(
+    backend: MatrixBackend,
+    num_states: int,
+    transitions: Iterable[Tuple[int, Any, int]],
+) -> Dict[Any, Any]:
+    indices: Dict[Any, Tuple[list, list]] = defaultdict(lambda: ([], []))
+    for idx_from, label, idx_to in transitions:
+        rows, cols = indices[label]
+        rows.append(idx_from)
+        cols.append(idx_to)
+
+    return {
+        label: backend.from_lists((num_states, num_states), rows, cols)
+        for label, (rows, cols) in indices.items()
+    }
+
+
+def _squaring_closure(backend: MatrixBackend, adjacency: Any) -> Any:
+    result = backend.dup(adjacency)
+    prev_nnz = -1
+    while prev_nnz != backend.nnz(result):
+        count_iteration("closure.squaring", backend.nnz(result))
+        prev_nnz = backend.nnz(result)
+        result = backend.mxm(result, result, out=result, accumulate=True)
+
+    return result
+
+
+def _frontier_closure(backend: MatrixBackend, adjacency: Any) -> Any:
+    result = backend.dup(adjacency)
+    frontier = adjacency
+    while backend.nnz(frontier) > 0:
+        count_iteration("closure.frontier", backend.nnz(result))
+        frontier = backend.difference(backend.mxm(frontier, adjacency), result)
+        result = backend.ewise_add(result, frontier)
+
+    return result
+
+
+class IndexMapping(Mapping):
+    # states of a full intersection are their own indices
+    def __init__(self, num_states: int):
+        self.num_states = num_states
+
+    def __getitem__(self, state: Any) -> int:
+        if isinstance(state, (int, np.integer)) and 0 <= state < self.num_states:
+            return int(state)
+        raise KeyError(state)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.num_states))
+
+    def __len__(self) -> int:
+        return self.num_states
+
+
+def state_indices(states_with_indices: Mapping, states: Iterable) -> np.ndarray:
+    return np.array(
+        sorted(
+            states_with_indices[state]
+            for state in states
+            if state in states_with_indices
+        ),
+        dtype=np.int64,
+    )
+
+
+def pair_indices(
+    self_indices: np.ndarray, other_indices: np.ndarray, other_num_states: int
+) -> np.ndarray:
+    return np.ravel(self_indices[:, None] * other_num_states + other_indices)
+
+
+def indicator(indices: np.ndarray, size: int) -> np.ndarray:
+    result = np.zeros(size, dtype=bool)
+    result[indices] = True
+    return result
+
+
+def _successor_pairs(
+    self_from: np.ndarray,
+    other_from: np.ndarray,
+    self_matrix: csr_matrix,
+    other_matrix: csr_matrix,
+    other_num_states: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # every (self_to, other_to) with self_from -> self_to and other_from -> other_to
+    self_degrees = np.diff(self_matrix.indptr)[self_from]
+    other_degrees = np.diff(other_matrix.indptr)[other_from]
+    counts = self_degrees * other_degrees
+
+    pairs = np.repeat(np.arange(len(self_from)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    self_offsets, other_offsets = np.divmod(offsets, other_degrees[pairs])
+
+    self_to = self_matrix.indices[self_matrix.indptr[self_from[pairs]] + self_offsets]
+    other_to = other_matrix.indices[
+        other_matrix.indptr[other_from[pairs]] + other_offsets
+    ]
+    return (
+        pairs,
+        self_to.astype(np.int64) * other_num_states + other_to,
+    )
@@ -0,0 +1,44 @@
+import argparse
+
+from project.benchmarks.benchmark import (
+    CFPQ_ENGINES,
+    RPQ_ENGINES,
+    default_cases,
+    run_benchmarks,
+    write_results,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RPQ and CFPQ engines")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--engines", nargs="*", help="run only these engines")
+    parser.add_argument("--cases", nargs="*", help="run only these graphs")
+    args = parser.parse_args()
+
+    def selected(engines):
+        return {
+            name: engine
+            for name, engine in engines.items()
+            if not args.engines or name in args.engines
+        }
+
+    cases = [
+        case
+        for case in default_cases(args.scale)
+        if not args.cases or case.name in args.cases
+    ]
+
+    measurements = run_benchmarks(
+        cases, selected(RPQ_ENGINES), selected(CFPQ_ENGINES), args.repeats
+    )
+    for m in measurements:
+        query = m.query.replace("\n", "; ")
+        print(f"{m.case:12} {m.engine:36} {m.median_time:9.4f}s  {query}")
+    write_results(measurements, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from pyformlang.regular_expression import Regex
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import time
+
+from project.benchmarks.graphs import (
+    chain_graph,
+    random_labeled_graph,
+    rdf_like_graph,
+    two_cycles_graph,
+)
+from project.cache.query_cache import query_cache
+from project.cfpq.cfpq import cfpq
+from project.cfpq.gll import gll_based
+from project.cfpq.hellings import hellings, indexed_hellings
+from project.cfpq.matrix_prod import (
+    cb_mprod_based_algorithm,
+    mprod_based_algorithm,
+    multi_source_mprod_based_algorithm,
+)
+from project.cfpq.tensor import cb_tensor_based, incremental_tensor_based, tensor_based
+from project.instrumentation.counters import iteration_counts, reset_iteration_counts
+from project.rpq.bfs_based_rpq import bfs_based_rpq
+from project.rpq.bfs_based_rpq_by_vertice import bfs_based_rpq_by_vertice
+from project.rpq.multi_source_rpq import multi_source_rpq
+from project.rpq.rpq import rpq
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    graph: MultiDiGraph
+    regexes: List[str] = field(default_factory=list)
+    grammars: List[str] = field(default_factory=list)
+    start_vertices: Optional[Set] = None
+
+
+@dataclass
+class Measurement:
+    case: str
+    engine: str
+    query: str
+    num_nodes: int
+    num_edges: int
+    times: List[float]
+    median_time: float
+    peak_rss_kb: int
+    iterations: Dict[str, int]
+    result_size: int
+
+
+def _bfs_based_rpq_size(graph: MultiDiGraph, regex: Regex, sources: Set) -> int:
+    return len(bfs_based_rpq(graph, regex, sources, set()))
+
+
+def _bfs_based_rpq_by_vertice_size(
+    graph: MultiDiGraph, regex: Regex, sources: Set, batched: bool
+) -> int:
+    return sum(
+        len(reachable)
+        for reachable in bfs_based_rpq_by_vertice(
+            graph, regex, sources, set(), batched
+        ).values()
+    )
+
+
+def _rpq_size(graph: MultiDiGraph, regex: Regex, sources: Set) -> int:
+    return len(rpq(graph, regex, sources))
+
+
+def _multi_source_rpq_size(graph: MultiDiGraph, regex: Regex, sources: Set) -> int:
+    return sum(1 for _ in multi_source_rpq(graph, regex, sources))
+
+
+def _cfpq_size(algorithm: Callable, graph: MultiDiGraph, cfg: CFG, sources: Set) -> int:
+    return len(cfpq(graph, cfg, algorithm, start_vertices=sources))
+
+
+RPQ_ENGINES: Dict[str, Callable[[MultiDiGraph, Regex, Set], int]] = {
+    "rpq": _rpq_size,
+    "multi_source_rpq": _multi_source_rpq_size,
+    "bfs_based_rpq": _bfs_based_rpq_size,
+    "bfs_based_rpq_by_vertice": partial(_bfs_based_rpq_by_vertice_size, batched=False),
+    "bfs_based_rpq_by_vertice_batched": partial(
+        _bfs_based_rpq_by_vertice_size, batched=True
+    ),
+}
+
+CFPQ_ENGINES: Dict[str, Callable[[MultiDiGraph, CFG, Set], int]] = {
+    name: partial(_cfpq_size, algorithm)
+    for name, algorithm in {
+        "hellings": hellings,
+        "indexed_hellings": indexed_hellings,
+        "mprod_based_algorithm": mprod_based_algorithm,
+        "multi_source_mprod_based_algorithm": multi_source_mprod_based_algorithm,
+        "gll_based": gll_based,
+        "tensor_based": tensor_based,
+        "incremental_tensor_based": incremental_tensor_based,
+        "cb_mprod_based_algorithm": cb_mprod_based_algorithm,
+        "cb_tensor_based": cb_tensor_based,
+    }.items()
+}
+
+
+def default_cases(scale: int = 1) -> List[BenchmarkCase]:
+    ab_grammars = ["S -> a S b | a b", "S -> a S b S | $"]
+    return [
+        BenchmarkCase(
+            "two_cycles",
+            two_cycles_graph(20 * scale, 15 * scale),
+            ["a*.b*", "(a|b)*.b"],
+            ab_grammars,
+        ),
+        BenchmarkCase(
+            "chain",
+            chain_graph(100 * scale),
+            ["(a.b)*", "(a|b)*"],
+            ab_grammars,
+        ),
+        BenchmarkCase(
+            "random",
+            random_labeled_graph(100 * scale, 300 * scale, ("a", "b", "c")),
+            ["a.b*.c", "(a|b)*.c"],
+            ab_grammars + ["S -> a S b | c"],
+        ),
+        BenchmarkCase(
+            "rdf_like",
+            rdf_like_graph(30 * scale, 70 * scale),
+            ["type.subClassOf*", "subClassOf_r*.type_r"],
+            [
+                "S -> subClassOf_r S subClassOf | subClassOf_r subClassOf "
+                "| type_r S type | type_r type",
+                "S -> B subClassOf | subClassOf\nB -> subClassOf_r B subClassOf "
+                "| subClassOf_r subClassOf",
+            ],
+        ),
+    ]
+
+
+def run_benchmarks(
+    cases: Iterable[BenchmarkCase],
+    rpq_engines: Optional[Dict[str, Callable]] = None,
+    cfpq_engines: Optional[Dict[str, Callable]] = None,
+    repeats: int = 3,
+    isolate: bool = True,
+) -> List[Measurement]:
+    rpq_engines = RPQ_ENGINES if rpq_engines is None else rpq_engines
+    cfpq_engines = CFPQ_ENGINES if cfpq_engines is None else cfpq_engines
+
+    result = []
+    for case in cases:
+        sources = set(case.start_vertices or case.graph.nodes)
+        runs = [
+            (name, engine, regex, Regex(regex))
+            for regex in case.regexes
+            for name, engine in rpq_engines.items()
+        ] + [
+            (name, engine, grammar, CFG.from_text(grammar))
+            for grammar in case.grammars
+            for name, engine in cfpq_engines.items()
+        ]
+        for name, engine, text, query in runs:
+            run = partial(_measure, engine, case.graph, query, sources, repeats)
+            times, peak_rss, iterations, size = _run_isolated(run) if isolate else run()
+            result.append(
+                Measurement(
+                    case.name,
+                    name,
+                    text,
+                    case.graph.number_of_nodes(),
+                    case.graph.number_of_edges(),
+                    times,
+                    statistics.median(times),
+                    peak_rss,
+                    iterations,
+                    size,
+                )
+            )
+
+    return result
+
+
+def write_results(measurements: List[Measurement], path: str) -> None:
+    report = {
+        "commit": _current_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "measurements": [asdict(measurement) for measurement in measurements],
+    }
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2, default=str)
+
+
+def _measure(
+    engine: Callable, graph: MultiDiGraph, query: Any, sources: Set, repeats: int
+):
+    times = []
+    for _ in range(repeats):
+        # compiled queries are cached between runs, measure them cold every time
+        query_cache.clear()
+        reset_iteration_counts()
+        start = time.perf_counter()
+        size = engine(graph, query, sources)
+        times.append(time.perf_counter() - start)
+
+    return (
+        times,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        iteration_counts(),
+        size,
+    )
+
+
+def _run_isolated(run: Callable):
+    # a fresh process per run so that ru_maxrss is not shared between engines
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_send_result, args=(run, sender))
+    process.start()
+    sender.close()
+    try:
+        status, value = receiver.recv()
+    except EOFError:
+        status, value = "error", RuntimeError("benchmark process died")
+    process.join()
+
+    if status == "error":
+        raise value
+    return value
+
+
+def _send_result(run: Callable, sender) -> None:
+    try:
+        sender.send(("ok", run()))
+    except Exception as error:
+        sender.send(("error", error))
+    finally:
+        sender.close()
+
+
+def _current_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
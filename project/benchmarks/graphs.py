@@ -0,0 +1,58 @@
+from networkx import MultiDiGraph
+from typing import Sequence, Tuple
+import random
+
+from project.graphs.utils import create_labeled_two_cycles_graph
+
+
+def two_cycles_graph(n: int, m: int, labels: Tuple[str, str] = ("a", "b")):
+    return create_labeled_two_cycles_graph(n, m, labels)
+
+
+def chain_graph(n: int, labels: Sequence[str] = ("a", "b")) -> MultiDiGraph:
+    graph = MultiDiGraph()
+    graph.add_nodes_from(range(n + 1))
+    graph.add_edges_from(
+        (i, i + 1, {"label": labels[i % len(labels)]}) for i in range(n)
+    )
+    return graph
+
+
+def random_labeled_graph(
+    num_nodes: int,
+    num_edges: int,
+    labels: Sequence[str] = ("a", "b"),
+    seed: int = 0,
+) -> MultiDiGraph:
+    rnd = random.Random(seed)
+    graph = MultiDiGraph()
+    graph.add_nodes_from(range(num_nodes))
+    if num_nodes > 0:
+        graph.add_edges_from(
+            (
+                rnd.randrange(num_nodes),
+                rnd.randrange(num_nodes),
+                {"label": rnd.choice(labels)},
+            )
+            for _ in range(num_edges)
+        )
+    return graph
+
+
+def rdf_like_graph(num_classes: int, num_instances: int, seed: int = 0) -> MultiDiGraph:
+    # class hierarchy with instances, every edge is paired with its inverse
+    # as in the RDF graphs of cfpq_data
+    rnd = random.Random(seed)
+    graph = MultiDiGraph()
+    graph.add_nodes_from(range(num_classes + num_instances))
+
+    def add_edge(v_from: int, v_to: int, label: str) -> None:
+        graph.add_edge(v_from, v_to, label=label)
+        graph.add_edge(v_to, v_from, label=f"{label}_r")
+
+    for cls in range(1, num_classes):
+        add_edge(cls, rnd.randrange(cls), "subClassOf")
+    for instance in range(num_classes, num_classes + num_instances):
+        add_edge(instance, rnd.randrange(max(num_classes, 1)), "type")
+
+    return graph
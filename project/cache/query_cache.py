@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from pyformlang.cfg import CFG
+from pyformlang.finite_automaton import DeterministicFiniteAutomaton
+from pyformlang.regular_expression import Regex
+from typing import Any, Callable, Hashable, Tuple, TypeVar, cast
+import threading
+
+from project.automata.decomposed_fa import DecomposedFA
+from project.automata.rsm import RecursiveStateMachine
+from project.automata.utils import regex_to_dfa
+from project.cfg.cfg import (
+    CykTables,
+    WcnfProductions,
+    cfg_to_cyk_tables,
+    cfg_to_wcnf_productions,
+)
+from project.cfg.ecfg import ECFG
+from project.instrumentation.profiler import phase
+
+T = TypeVar("T")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class BoundedCache:
+    def __init__(self, maxsize: int = 128, policy: str = "lru"):
+        if policy not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.stats = CacheStats()
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self.stats.hits += 1
+                if self.policy == "lru":
+                    self._items.move_to_end(key)
+                return self._items[key]
+
+            self.stats.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.stats.evictions += 1
+
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.stats = CacheStats()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def regex_key(regex: Regex) -> Hashable:
+    # the parse tree with node types, str(regex) renders Empty and the symbol
+    # "Empty" alike
+    return (
+        type(regex.head).__name__,
+        repr(regex.head.value),
+        tuple(regex_key(son) for son in regex.sons),
+    )
+
+
+def cfg_key(cfg: CFG) -> Hashable:
+    # symbols with their types, the text form merges Terminal("a b") with a b
+    def symbol_key(symbol: Any) -> Tuple[str, str]:
+        return type(symbol).__name__, repr(symbol.value)
+
+    productions = sorted(
+        (symbol_key(production.head), tuple(map(symbol_key, production.body)))
+        for production in cfg.productions
+    )
+    start = None if cfg.start_symbol is None else symbol_key(cfg.start_symbol)
+    return start, tuple(productions)
+
+
+class QueryCache:
+    # compiled artifacts are shared between callers and must not be mutated
+    def __init__(self, maxsize: int = 128, policy: str = "lru"):
+        self.cache = BoundedCache(maxsize, policy)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def regex_dfa(self, regex: Regex) -> DeterministicFiniteAutomaton:
+        return self._get_or_compute(
+            "regex_dfa", regex_key(regex), lambda: regex_to_dfa(regex)
+        )
+
+    def decomposed_regex(self, regex: Regex) -> DecomposedFA:
+        return self._get_or_compute(
+            "decomposed_regex",
+            regex_key(regex),
+            lambda: DecomposedFA.from_fa(self.regex_dfa(regex)),
+        )
+
+    def wcnf_productions(self, cfg: CFG) -> WcnfProductions:
+        return self._get_or_compute(
+            "wcnf_productions", cfg_key(cfg), lambda: cfg_to_wcnf_productions(cfg)
+        )
+
+    def cyk_tables(self, cfg: CFG) -> CykTables:
+        return self._get_or_compute(
+            "cyk_tables", cfg_key(cfg), lambda: cfg_to_cyk_tables(cfg)
+        )
+
+    def rsm(self, cfg: CFG) -> RecursiveStateMachine:
+        return self._get_or_compute(
+            "rsm",
+            cfg_key(cfg),
+            lambda: RecursiveStateMachine.from_ecfg(ECFG.from_cfg(cfg)),
+        )
+
+    def decomposed_rsm(self, cfg: CFG) -> DecomposedFA:
+        return self._get_or_compute(
+            "decomposed_rsm",
+            cfg_key(cfg),
+            lambda: DecomposedFA.from_rsm(self.rsm(cfg)),
+        )
+
+    def _get_or_compute(self, kind: str, key: Hashable, compute: Callable[[], T]) -> T:
+        def compute_in_phase() -> T:
+            with phase(f"compile.{kind}"):
+                return compute()
+
+        return cast(T, self.cache.get_or_compute((kind, key), compute_in_phase))
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+query_cache = QueryCache()
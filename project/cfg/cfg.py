@@ -1,5 +1,16 @@
 import os
-from pyformlang.cfg import CFG
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Tuple
+from pyformlang.cfg import CFG, Terminal, Variable
+import numpy as np
+
+
+@dataclass(frozen=True)
+class WcnfProductions:
+    variables: FrozenSet[Variable]
+    epsilon_productions: FrozenSet[Variable]
+    terminal_productions: FrozenSet[Tuple[Variable, Terminal]]
+    variable_productions: FrozenSet[Tuple[Variable, Variable, Variable]]
 
 
 def cfg_to_wcnf(cfg: CFG) -> CFG:
@@ -10,6 +21,78 @@ def cfg_to_wcnf(cfg: CFG) -> CFG:
     return CFG(start_symbol=wcnf.start_symbol, productions=wcnf_productions)
 
 
+def cfg_to_wcnf_productions(cfg: CFG) -> WcnfProductions:
+    wcnf = cfg_to_wcnf(cfg)
+
+    return WcnfProductions(
+        frozenset(wcnf.variables),
+        frozenset(
+            production.head
+            for production in wcnf.productions
+            if len(production.body) == 0
+        ),
+        frozenset(
+            (production.head, production.body[0])
+            for production in wcnf.productions
+            if len(production.body) == 1
+        ),
+        frozenset(
+            (production.head, production.body[0], production.body[1])
+            for production in wcnf.productions
+            if len(production.body) == 2
+        ),
+    )
+
+
+@dataclass(frozen=True)
+class CykTables:
+    # variables of the cnf are bits of uint64 words, pair p stands for the
+    # body (pair_left[p], pair_right[p]) and pair_heads[p] is the set of its heads
+    variables: Tuple[Variable, ...]
+    generates_epsilon: bool
+    start_mask: np.ndarray
+    terminal_masks: Dict[Any, np.ndarray]
+    pair_left: np.ndarray
+    pair_right: np.ndarray
+    pair_heads: np.ndarray
+
+
+def cfg_to_cyk_tables(cfg: CFG) -> CykTables:
+    cnf = cfg.to_normal_form()
+    variables = tuple(sorted(cnf.variables | {cnf.start_symbol}, key=str))
+    indices = {variable: i for i, variable in enumerate(variables)}
+    num_words = -(-len(variables) // 64)
+
+    def mask(variable_indices: Any) -> np.ndarray:
+        result = np.zeros(num_words, dtype=np.uint64)
+        for i in variable_indices:
+            result[i // 64] |= np.uint64(1) << np.uint64(i % 64)
+        return result
+
+    terminal_heads: Dict[Any, list] = dict()
+    pair_heads: Dict[Tuple[int, int], list] = dict()
+    for production in cnf.productions:
+        head = indices[production.head]
+        if len(production.body) == 1:
+            terminal_heads.setdefault(production.body[0].value, []).append(head)
+        elif len(production.body) == 2:
+            body = (indices[production.body[0]], indices[production.body[1]])
+            pair_heads.setdefault(body, []).append(head)
+
+    pairs = list(pair_heads)
+    return CykTables(
+        variables,
+        cfg.generate_epsilon(),
+        mask([indices[cnf.start_symbol]]),
+        {terminal: mask(heads) for terminal, heads in terminal_heads.items()},
+        np.array([left for left, _ in pairs], dtype=np.int64),
+        np.array([right for _, right in pairs], dtype=np.int64),
+        np.array([mask(pair_heads[pair]) for pair in pairs], dtype=np.uint64).reshape(
+            len(pairs), num_words
+        ),
+    )
+
+
 def cfg_from_file(path: str) -> CFG:
     if not os.path.exists(path):
         raise FileNotFoundError(path)
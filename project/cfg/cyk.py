@@ -0,0 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+from pyformlang.cfg import CFG
+from typing import Any, Iterable, List, Optional, Sequence, Union
+import numpy as np
+import os
+
+from project.cache.query_cache import query_cache
+from project.cfg.cfg import CykTables
+from project.instrumentation.profiler import phase
+
+# per-worker tables, set once by the pool initializer
+_worker_tables: Optional[CykTables] = None
+
+
+def cyk(grammar: Union[CFG, CykTables], word: Sequence[Any]) -> bool:
+    # word is a string or a sequence of terminal values
+    tables = _tables(grammar)
+    num_symbols = len(word)
+    if num_symbols == 0:
+        return tables.generates_epsilon
+
+    num_words = len(tables.start_mask)
+    # cells[i, j] is the set of variables deriving word[i:j]
+    cells = np.zeros((num_symbols, num_symbols + 1, num_words), dtype=np.uint64)
+    for i, symbol in enumerate(word):
+        if symbol not in tables.terminal_masks:
+            return False
+        cells[i, i + 1] = tables.terminal_masks[symbol]
+
+    left_words, left_shifts = np.divmod(tables.pair_left, 64)
+    right_words, right_shifts = np.divmod(tables.pair_right, 64)
+    left_shifts, right_shifts = (
+        left_shifts.astype(np.uint64),
+        right_shifts.astype(np.uint64),
+    )
+    for length in range(2, num_symbols + 1):
+        starts = np.arange(num_symbols - length + 1)[:, None]
+        splits = starts + np.arange(1, length)[None, :]
+        left = cells[starts, splits]
+        right = cells[splits, starts + length]
+
+        # pairs whose body is matched by some split, then the union of their heads
+        matched = (
+            (left[..., left_words] >> left_shifts)
+            & (right[..., right_words] >> right_shifts)
+            & np.uint64(1)
+        ).any(axis=1)
+        cells[starts[:, 0], starts[:, 0] + length] = np.bitwise_or.reduce(
+            np.where(matched[..., None], tables.pair_heads, np.uint64(0)), axis=1
+        )
+
+    return bool((cells[0, num_symbols] & tables.start_mask).any())
+
+
+def cyk_batch(
+    grammar: Union[CFG, CykTables],
+    words: Iterable[Sequence[Any]],
+    max_workers: Optional[int] = None,
+    chunk_size: int = 1024,
+) -> List[bool]:
+    tables = _tables(grammar)
+    # repeated words, common in logs, are checked once
+    keys = [word if isinstance(word, str) else tuple(word) for word in words]
+    unique = list(dict.fromkeys(keys))
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with phase("cyk.batch"):
+        if max_workers == 1 or len(unique) <= chunk_size:
+            results = [cyk(tables, word) for word in unique]
+        else:
+            chunks = [
+                unique[i : i + chunk_size] for i in range(0, len(unique), chunk_size)
+            ]
+            with ProcessPoolExecutor(
+                max_workers, initializer=_set_worker_tables, initargs=(tables,)
+            ) as executor:
+                results = [
+                    result
+                    for chunk_results in executor.map(_check_chunk, chunks)
+                    for result in chunk_results
+                ]
+
+    accepted = dict(zip(unique, results))
+    return [accepted[key] for key in keys]
+
+
+def cyk_file(
+    grammar: Union[CFG, CykTables],
+    path: str,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 1024,
+) -> List[bool]:
+    # every line without its line break is a word
+    with open(path, "r") as file:
+        words = [line.rstrip("\r\n") for line in file]
+
+    return cyk_batch(grammar, words, max_workers, chunk_size)
+
+
+def _tables(grammar: Union[CFG, CykTables]) -> CykTables:
+    if isinstance(grammar, CykTables):
+        return grammar
+    return query_cache.cyk_tables(grammar)
+
+
+def _set_worker_tables(tables: CykTables) -> None:
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _check_chunk(words: List[Sequence[Any]]) -> List[bool]:
+    return [cyk(_worker_tables, word) for word in words]
@@ -1,22 +1,32 @@
-from typing import Set, Callable
-from networkx import MultiDiGraph
+from typing import AbstractSet, Callable, Set
 from pyformlang.cfg import CFG, Variable
 
+from project.cfpq.engines import run_engine
+from project.graphs.graph_store import GraphSource, labeled_graph
+from project.results.results import TriplesResult
+
 
 def cfpq(
-    graph: MultiDiGraph,
+    graph: GraphSource,
     cfg: CFG,
     algorithm: Callable,
     start_variable: Variable = Variable("S"),
     start_vertices: "Set | None" = None,
     final_vertices: "Set | None" = None,
-) -> Set:
+) -> AbstractSet:
+    # engines walk edges, so stored and preloaded matrices are turned into them
+    graph = labeled_graph(graph)
+    result = run_engine(algorithm, graph, cfg, start_vertices, start_variable)
+    if isinstance(result, TriplesResult):
+        return result[start_variable].restrict(
+            start_vertices or None, final_vertices or None
+        )
+
     if not start_vertices:
         start_vertices = set(graph.nodes)
     if not final_vertices:
         final_vertices = set(graph.nodes)
 
-    result = algorithm(graph, cfg)
     return set(
         (v_from, v_to)
         for variable, v_from, v_to in result
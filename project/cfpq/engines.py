@@ -0,0 +1,35 @@
+from functools import partial
+from pyformlang.cfg import CFG, Variable
+from typing import Any, Callable, Set, TypeVar
+import inspect
+
+Engine = TypeVar("Engine", bound=Callable)
+
+
+def source_aware(algorithm: Engine) -> Engine:
+    # marks engines called as algorithm(graph, cfg, start_vertices, start_variable)
+    # that only answer for paths from start_vertices
+    setattr(algorithm, "source_aware", True)
+    return algorithm
+
+
+def is_source_aware(algorithm: Callable) -> bool:
+    # sees through functools.partial and functools.wraps wrappers
+    while isinstance(algorithm, partial):
+        algorithm = algorithm.func
+    return any(
+        getattr(function, "source_aware", False)
+        for function in (algorithm, inspect.unwrap(algorithm))
+    )
+
+
+def run_engine(
+    algorithm: Callable,
+    graph: Any,
+    cfg: CFG,
+    start_vertices: "Set | None" = None,
+    start_variable: Variable = Variable("S"),
+) -> Any:
+    if is_source_aware(algorithm):
+        return algorithm(graph, cfg, start_vertices or set(), start_variable)
+    return algorithm(graph, cfg)
@@ -0,0 +1,127 @@
+from collections import defaultdict
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG, Variable
+from typing import Any, Dict, List, Set, Tuple
+
+from project.automata.rsm import RecursiveStateMachine
+from project.cache.query_cache import query_cache
+from project.cfpq.engines import source_aware
+from project.results.results import TriplesResult
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
+
+# a gss node is a call of a box at a graph vertex, (variable, vertex)
+GssNode = Tuple[Variable, Any]
+# a descriptor is a position in an rsm box, a graph vertex and the current call
+Descriptor = Tuple[int, Any, GssNode]
+
+
+class RsmBoxes:
+    # rsm states numbered over all boxes, with transitions split into
+    # terminal moves by label and calls of other boxes
+    def __init__(self, rsm: RecursiveStateMachine):
+        self.start_states: Dict[Variable, int] = dict()
+        self.is_final: List[bool] = []
+        self.terminal_moves: List[Dict[Any, List[int]]] = []
+        self.calls: List[List[Tuple[Variable, int]]] = []
+
+        variables = {variable.value: variable for variable in rsm.automata}
+        indices: Dict[Tuple[Variable, Any], int] = dict()
+        for variable, dfa in rsm.automata.items():
+            for state in dfa.states:
+                indices[(variable, state)] = len(self.is_final)
+                self.is_final.append(state in dfa.final_states)
+                self.terminal_moves.append(defaultdict(list))
+                self.calls.append([])
+            if dfa.start_state is not None:
+                self.start_states[variable] = indices[(variable, dfa.start_state)]
+
+        for variable, dfa in rsm.automata.items():
+            for s_from, label, s_to in dfa:
+                idx_from, idx_to = (
+                    indices[(variable, s_from)],
+                    indices[(variable, s_to)],
+                )
+                if label.value in variables:
+                    self.calls[idx_from].append((variables[label.value], idx_to))
+                else:
+                    self.terminal_moves[idx_from][label.value].append(idx_to)
+
+
+@source_aware
+def gll_based(
+    graph: MultiDiGraph,
+    cfg: CFG,
+    start_vertices: Set = set(),
+    start_variable: Variable = Variable("S"),
+) -> TriplesResult:
+    # only calls made while answering start_variable from start_vertices are
+    # explored, so triples of other variables cover just the vertices they were
+    # called from
+    with phase("gll.cfg_to_rsm"):
+        boxes = RsmBoxes(query_cache.rsm(cfg))
+
+    with phase("gll.init"):
+        edges: Dict[Any, Dict[Any, List]] = defaultdict(lambda: defaultdict(list))
+        for v_from, v_to, label in graph.edges(data="label"):
+            edges[v_from][label].append(v_to)
+
+        sources = [v for v in graph.nodes if not start_vertices or v in start_vertices]
+        # gss edges lead from a call to the return positions of its callers
+        returns: Dict[GssNode, Set[Tuple[int, GssNode]]] = defaultdict(set)
+        popped: Dict[GssNode, Set] = defaultdict(set)
+        visited: Set[Descriptor] = set()
+        worklist: List[Descriptor] = []
+
+        def add(descriptor: Descriptor) -> None:
+            if descriptor not in visited:
+                visited.add(descriptor)
+                worklist.append(descriptor)
+
+        if start_variable in boxes.start_states:
+            for vertice in sources:
+                add(
+                    (
+                        boxes.start_states[start_variable],
+                        vertice,
+                        (start_variable, vertice),
+                    )
+                )
+
+    with phase("gll.worklist"):
+        while len(worklist) > 0:
+            count_iteration("gll", len(visited))
+            current, worklist = worklist, []
+            for state, vertice, gss_node in current:
+                if boxes.is_final[state] and vertice not in popped[gss_node]:
+                    popped[gss_node].add(vertice)
+                    for return_state, caller in returns[gss_node]:
+                        add((return_state, vertice, caller))
+
+                for label, states_to in boxes.terminal_moves[state].items():
+                    for vertice_to in edges[vertice].get(label, []):
+                        for state_to in states_to:
+                            add((state_to, vertice_to, gss_node))
+
+                for variable, return_state in boxes.calls[state]:
+                    if variable not in boxes.start_states:
+                        continue
+
+                    callee = (variable, vertice)
+                    if (return_state, gss_node) in returns[callee]:
+                        continue
+
+                    returns[callee].add((return_state, gss_node))
+                    for vertice_to in popped[callee]:
+                        add((return_state, vertice_to, gss_node))
+                    add((boxes.start_states[variable], vertice, callee))
+
+    with phase("gll.extract_result"):
+        return TriplesResult.from_triples(
+            (
+                (variable, v_from, v_to)
+                for (variable, v_from), vertices_to in popped.items()
+                for v_to in vertices_to
+            ),
+            list(graph.nodes),
+        )
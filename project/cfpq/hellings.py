@@ -1,61 +1,120 @@
-from typing import Set
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
 from networkx import MultiDiGraph
 from pyformlang.cfg import CFG, Terminal, Variable
 
-from project.cfg.cfg import cfg_to_wcnf
-
-
-def hellings(graph: MultiDiGraph, cfg: CFG) -> Set:
-    wcnf = cfg_to_wcnf(cfg)
-
-    epsilon_productions = set(
-        production.head for production in wcnf.productions if len(production.body) == 0
-    )
-    terminal_productions = set(
-        (production.head, production.body[0])
-        for production in wcnf.productions
-        if len(production.body) == 1
-    )
-    variable_productions = set(
-        (production.head, production.body[0], production.body[1])
-        for production in wcnf.productions
-        if len(production.body) == 2
-    )
-
-    result = set(
-        (variable, vertice, vertice)
-        for variable in epsilon_productions
-        for vertice in graph.nodes
-    ) | set(
-        (variable, v_from, v_to)
-        for variable, terminal in terminal_productions
-        for v_from, v_to, label in graph.edges(data="label")
-        if terminal == Terminal(label)
-    )
-
-    queue = result.copy()
-    while len(queue) > 0:
-        var_i, v_from, v_to = queue.pop()
-
-        queue |= set(
-            triple
-            for var_k, l_var, r_var in variable_productions
-            for var_j, u_from, u_to in result
-            if (
-                # in case (var_j, u_from, v_from) \in result
-                # and there is a production var_k -> var_j var_i
-                path := (u_from, v_to)
-                if u_to == v_from and l_var == var_j and r_var == var_i
-                else (
-                    # in case (var_j, v_to, u_to) \in result
-                    # and there is a production var_k -> var_i var_j
-                    (v_from, u_to)
-                    if u_from == v_to and l_var == var_i and r_var == var_j
-                    else None
+from project.cache.query_cache import query_cache
+from project.results.results import TriplesResult
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
+
+
+def hellings(graph: MultiDiGraph, cfg: CFG) -> TriplesResult:
+    with phase("hellings.cfg_to_wcnf"):
+        wcnf = query_cache.wcnf_productions(cfg)
+        epsilon_productions = wcnf.epsilon_productions
+        terminal_productions = wcnf.terminal_productions
+        variable_productions = wcnf.variable_productions
+
+    with phase("hellings.init"):
+        result = set(
+            (variable, vertice, vertice)
+            for variable in epsilon_productions
+            for vertice in graph.nodes
+        ) | set(
+            (variable, v_from, v_to)
+            for variable, terminal in terminal_productions
+            for v_from, v_to, label in graph.edges(data="label")
+            if terminal == Terminal(label)
+        )
+
+    with phase("hellings.fixpoint"):
+        queue = result.copy()
+        while len(queue) > 0:
+            count_iteration("hellings", len(result))
+            var_i, v_from, v_to = queue.pop()
+
+            queue |= set(
+                triple
+                for var_k, l_var, r_var in variable_productions
+                for var_j, u_from, u_to in result
+                if (
+                    # in case (var_j, u_from, v_from) \in result
+                    # and there is a production var_k -> var_j var_i
+                    path := (u_from, v_to)
+                    if u_to == v_from and l_var == var_j and r_var == var_i
+                    else (
+                        # in case (var_j, v_to, u_to) \in result
+                        # and there is a production var_k -> var_i var_j
+                        (v_from, u_to)
+                        if u_from == v_to and l_var == var_i and r_var == var_j
+                        else None
+                    )
                 )
+                and (triple := (var_k,) + path) not in result
             )
-            and (triple := (var_k,) + path) not in result
-        )
-        result |= queue
+            result |= queue
+
+    with phase("hellings.extract_result"):
+        return TriplesResult.from_triples(result, list(graph.nodes))
+
+
+def indexed_hellings(graph: MultiDiGraph, cfg: CFG) -> TriplesResult:
+    with phase("indexed_hellings.cfg_to_wcnf"):
+        wcnf = query_cache.wcnf_productions(cfg)
+        epsilon_productions = wcnf.epsilon_productions
+        terminal_productions = wcnf.terminal_productions
+
+    # productions var_k -> l_var r_var indexed by each of their body symbols
+    productions_by_left: Dict[Variable, Set] = defaultdict(set)
+    productions_by_right: Dict[Variable, Set] = defaultdict(set)
+    for head, l_var, r_var in wcnf.variable_productions:
+        productions_by_left[l_var].add((head, r_var))
+        productions_by_right[r_var].add((head, l_var))
+
+    # derived facts (var, v_from, v_to) indexed by (var, v_from) and (var, v_to)
+    successors: Dict[Tuple, Set] = defaultdict(set)
+    predecessors: Dict[Tuple, Set] = defaultdict(set)
+    result: Set = set()
+    queue: List = []
+
+    def add_fact(variable: Variable, v_from: Any, v_to: Any) -> None:
+        triple = (variable, v_from, v_to)
+        if triple in result:
+            return
+
+        result.add(triple)
+        successors[(variable, v_from)].add(v_to)
+        predecessors[(variable, v_to)].add(v_from)
+        queue.append(triple)
+
+    with phase("indexed_hellings.init"):
+        for variable in epsilon_productions:
+            for vertice in graph.nodes:
+                add_fact(variable, vertice, vertice)
+
+        variables_by_terminal: Dict[Terminal, Set] = defaultdict(set)
+        for variable, terminal in terminal_productions:
+            variables_by_terminal[terminal].add(variable)
+
+        for v_from, v_to, label in graph.edges(data="label"):
+            for variable in variables_by_terminal.get(Terminal(label), ()):
+                add_fact(variable, v_from, v_to)
+
+    with phase("indexed_hellings.fixpoint"):
+        while len(queue) > 0:
+            count_iteration("indexed_hellings", len(result))
+            var_i, v_from, v_to = queue.pop()
+
+            # (var_j, v_to, u_to) \in result and var_k -> var_i var_j
+            for var_k, var_j in productions_by_left.get(var_i, ()):
+                for u_to in list(successors.get((var_j, v_to), ())):
+                    add_fact(var_k, v_from, u_to)
+
+            # (var_j, u_from, v_from) \in result and var_k -> var_j var_i
+            for var_k, var_j in productions_by_right.get(var_i, ()):
+                for u_from in list(predecessors.get((var_j, v_from), ())):
+                    add_fact(var_k, u_from, v_to)
 
-    return result
+    with phase("indexed_hellings.extract_result"):
+        return TriplesResult.from_triples(result, list(graph.nodes))
@@ -1,108 +1,221 @@
-from typing import Set
+from collections import defaultdict
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set, Tuple, Union
 from networkx import MultiDiGraph
-from pyformlang.cfg import CFG, Terminal
+from pyformlang.cfg import CFG, Variable
 from scipy.sparse import csr_matrix
-import pycubool as pcb
+import numpy as np
+
+from project.automata.backends import backend_of, get_backend, to_backend
+from project.cache.query_cache import query_cache
+from project.cfpq.engines import source_aware
+from project.cfg.cfg import WcnfProductions
+from project.graphs.labeled_graph import LabeledGraph, edges_by_label, node_indices
+from project.results.results import TriplesResult
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
+
+
+def mprod_based_algorithm(
+    graph: Union[MultiDiGraph, LabeledGraph],
+    cfg: CFG,
+    semi_naive: bool = True,
+    backend: str = "sparse",
+) -> TriplesResult:
+    with phase("mprod.cfg_to_wcnf"):
+        wcnf = query_cache.wcnf_productions(cfg)
+        variable_productions = wcnf.variable_productions
 
-from project.cfg.cfg import cfg_to_wcnf
+    num_nodes = graph.number_of_nodes()
+    if num_nodes == 0:
+        return TriplesResult(dict(), [])
 
+    with phase("mprod.init"):
+        nodes = node_indices(graph)
+        matrices = _base_matrices(graph, wcnf, wcnf.variables, backend)
+        if backend == "auto":
+            _rebalance(matrices)
 
-def mprod_based_algorithm(graph: MultiDiGraph, cfg: CFG) -> Set:
-    wcnf = cfg_to_wcnf(cfg)
+    with phase("mprod.fixpoint"):
+        if semi_naive:
+            _semi_naive_fixpoint(matrices, variable_productions, backend)
+        else:
+            _naive_fixpoint(matrices, variable_productions, backend)
 
-    epsilon_productions = set(
-        production.head for production in wcnf.productions if len(production.body) == 0
-    )
-    terminal_productions = set(
-        (production.head, production.body[0])
-        for production in wcnf.productions
-        if len(production.body) == 1
-    )
-    variable_productions = set(
-        (production.head, production.body[0], production.body[1])
-        for production in wcnf.productions
-        if len(production.body) == 2
-    )
+    with phase("mprod.extract_result"):
+        return TriplesResult(matrices, list(nodes))
 
-    num_nodes = graph.number_of_nodes()
-    nodes = {vertice: i for i, vertice in enumerate(graph.nodes)}
-    matrices = {
-        var: csr_matrix((num_nodes, num_nodes), dtype=bool) for var in wcnf.variables
-    }
 
-    for vertice in nodes:
-        for variable in epsilon_productions:
-            matrices[variable][vertice, vertice] = True
+def cb_mprod_based_algorithm(
+    graph: Union[MultiDiGraph, LabeledGraph], cfg: CFG, semi_naive: bool = True
+) -> TriplesResult:
+    return mprod_based_algorithm(graph, cfg, semi_naive, backend="cubool")
 
-    for v_from, v_to, label in graph.edges(data="label"):
-        for variable, terminal in terminal_productions:
-            if terminal == Terminal(label):
-                matrices[variable][nodes[v_from], nodes[v_to]] = True
 
+def _naive_fixpoint(
+    matrices: Dict, variable_productions: AbstractSet, backend: str = "sparse"
+) -> None:
+    ops = get_backend(backend)
     matrix_changed = True
     while matrix_changed:
+        count_iteration("mprod.naive", _total_nnz(matrices))
         matrix_changed = False
         for variable, l_var, r_var in variable_productions:
-            prev_nnz = matrices[variable].nnz
-            matrices[variable] += matrices[l_var] @ matrices[r_var]
-            matrix_changed |= prev_nnz != matrices[variable].nnz
-
-    nodes_by_indices = {i: vertice for vertice, i in nodes.items()}
-    return {
-        (variable, nodes_by_indices[v_from], nodes_by_indices[v_to])
-        for variable, matrix in matrices.items()
-        for v_from, v_to in zip(*matrix.nonzero())
-    }
+            prev_nnz = ops.nnz(matrices[variable])
+            matrices[variable] = ops.mxm(
+                matrices[l_var],
+                matrices[r_var],
+                out=matrices[variable],
+                accumulate=True,
+            )
+            matrix_changed |= prev_nnz != ops.nnz(matrices[variable])
+
+        if backend == "auto":
+            _rebalance(matrices)
+
+
+def _semi_naive_fixpoint(
+    matrices: Dict,
+    variable_productions: AbstractSet,
+    backend: str = "sparse",
+    deltas: Optional[Dict] = None,
+) -> None:
+    # facts derived in the previous round, only they can produce new facts;
+    # deltas already added to matrices may be passed to continue a fixpoint
+    ops = get_backend(backend)
+    if deltas is None:
+        deltas = {variable: ops.dup(matrix) for variable, matrix in matrices.items()}
+    while any(ops.nnz(delta) > 0 for delta in deltas.values()):
+        count_iteration("mprod.semi_naive", _total_nnz(matrices))
+        products = {
+            variable: ops.empty(matrix.shape) for variable, matrix in matrices.items()
+        }
+        for variable, l_var, r_var in variable_productions:
+            if ops.nnz(deltas[l_var]) > 0:
+                products[variable] = ops.mxm(
+                    deltas[l_var],
+                    matrices[r_var],
+                    out=products[variable],
+                    accumulate=True,
+                )
+            if ops.nnz(deltas[r_var]) > 0:
+                products[variable] = ops.mxm(
+                    matrices[l_var],
+                    deltas[r_var],
+                    out=products[variable],
+                    accumulate=True,
+                )
+
+        for variable, product in products.items():
+            deltas[variable] = ops.difference(product, matrices[variable])
+            matrices[variable] = ops.ewise_add(matrices[variable], deltas[variable])
+
+        if backend == "auto":
+            _rebalance(matrices)
+
+
+def _rebalance(matrices: Dict) -> None:
+    # relations only grow, so sparse ones are moved to bits once they fill up
+    for variable, matrix in matrices.items():
+        matrices[variable] = to_backend(matrix, "auto")
+
+
+@source_aware
+def multi_source_mprod_based_algorithm(
+    graph: Union[MultiDiGraph, LabeledGraph],
+    cfg: CFG,
+    start_vertices: Set = set(),
+    start_variable: Variable = Variable("S"),
+) -> TriplesResult:
+    # only rows of start_variable for start_vertices are complete,
+    # rows of other variables are filled for the vertices they are needed from
+    with phase("mprod.multi_source.cfg_to_wcnf"):
+        wcnf = query_cache.wcnf_productions(cfg)
+
+    with phase("mprod.multi_source.init"):
+        num_nodes = graph.number_of_nodes()
+        nodes = node_indices(graph)
+        variables = wcnf.variables | {start_variable}
+        base = _base_matrices(graph, wcnf, variables)
+
+        # sources[var] marks the vertices var-paths are requested from
+        sources = {variable: np.zeros(num_nodes, dtype=bool) for variable in variables}
+        sources[start_variable][
+            [nodes[v] for v in start_vertices if v in nodes]
+            if start_vertices
+            else list(range(num_nodes))
+        ] = True
+        matrices = {
+            variable: csr_matrix((num_nodes, num_nodes), dtype=bool)
+            for variable in variables
+        }
+
+    with phase("mprod.multi_source.fixpoint"):
+        changed = True
+        while changed:
+            count_iteration("mprod.multi_source", _total_nnz(matrices))
+            prev_size = sum(matrices[v].nnz + int(sources[v].sum()) for v in variables)
+            for variable in variables:
+                matrices[variable] += _select_rows(base[variable], sources[variable])
+
+            for variable, l_var, r_var in wcnf.variable_productions:
+                sources[l_var] |= sources[variable]
+                left = _select_rows(matrices[l_var], sources[variable])
+                sources[r_var][left.indices] = True
+                matrices[variable] += left @ matrices[r_var]
+
+            changed = prev_size != sum(
+                matrices[v].nnz + int(sources[v].sum()) for v in variables
+            )
 
+    with phase("mprod.multi_source.extract_result"):
+        return TriplesResult(matrices, list(nodes))
 
-def cb_mprod_based_algorithm(graph: MultiDiGraph, cfg: CFG) -> Set:
-    wcnf = cfg_to_wcnf(cfg)
-
-    epsilon_productions = set(
-        production.head for production in wcnf.productions if len(production.body) == 0
-    )
-    terminal_productions = set(
-        (production.head, production.body[0])
-        for production in wcnf.productions
-        if len(production.body) == 1
-    )
-    variable_productions = set(
-        (production.head, production.body[0], production.body[1])
-        for production in wcnf.productions
-        if len(production.body) == 2
-    )
 
+def _base_matrices(
+    graph: Union[MultiDiGraph, LabeledGraph],
+    wcnf: WcnfProductions,
+    variables: Iterable[Variable],
+    backend: str = "sparse",
+) -> Dict:
+    # epsilon and terminal productions, edges are taken label by label
     num_nodes = graph.number_of_nodes()
-    if num_nodes == 0:
-        return set()
-
-    nodes = {vertice: i for i, vertice in enumerate(graph.nodes)}
-    matrices = {
-        var: pcb.Matrix.empty(shape=(num_nodes, num_nodes)) for var in wcnf.variables
+    indices: Dict[Variable, Tuple[List[np.ndarray], List[np.ndarray]]] = {
+        variable: ([], []) for variable in variables
+    }
+    for variable in wcnf.epsilon_productions:
+        indices[variable][0].append(np.arange(num_nodes))
+        indices[variable][1].append(np.arange(num_nodes))
+
+    heads = defaultdict(list)
+    for variable, terminal in wcnf.terminal_productions:
+        heads[terminal.value].append(variable)
+    for label, (rows, cols) in edges_by_label(graph).items():
+        for variable in heads.get(label, []):
+            indices[variable][0].append(rows)
+            indices[variable][1].append(cols)
+
+    ops = get_backend(backend)
+    return {
+        variable: ops.from_lists(
+            (num_nodes, num_nodes),
+            np.concatenate(rows) if len(rows) > 0 else [],
+            np.concatenate(cols) if len(cols) > 0 else [],
+        )
+        for variable, (rows, cols) in indices.items()
     }
 
-    for vertice in nodes:
-        for variable in epsilon_productions:
-            matrices[variable][vertice, vertice] = True
 
-    for v_from, v_to, label in graph.edges(data="label"):
-        for variable, terminal in terminal_productions:
-            if terminal == Terminal(label):
-                matrices[variable][nodes[v_from], nodes[v_to]] = True
+def _total_nnz(matrices: Dict) -> int:
+    return sum(backend_of(matrix).nnz(matrix) for matrix in matrices.values())
 
-    matrix_changed = True
-    while matrix_changed:
-        matrix_changed = False
-        for variable, l_var, r_var in variable_productions:
-            prev_nnz = matrices[variable].nvals
-            matrices[l_var].mxm(
-                matrices[r_var], out=matrices[variable], accumulate=True
-            )
-            matrix_changed |= prev_nnz != matrices[variable].nvals
 
-    nodes_by_indices = {i: vertice for vertice, i in nodes.items()}
-    return {
-        (variable, nodes_by_indices[v_from], nodes_by_indices[v_to])
-        for variable, matrix in matrices.items()
-        for v_from, v_to in matrix
-    }
+def _select_rows(matrix: csr_matrix, rows: np.ndarray) -> csr_matrix:
+    indices = np.flatnonzero(rows)
+    return (
+        csr_matrix(
+            (np.ones(len(indices), dtype=bool), (indices, indices)),
+            shape=(len(rows), len(rows)),
+            dtype=bool,
+        )
+        @ matrix
+    )
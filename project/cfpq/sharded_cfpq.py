@@ -0,0 +1,204 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG, Variable
+from scipy.sparse import csr_matrix
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+import numpy as np
+import os
+
+from project.automata.decomposed_fa import DecomposedFA, indicator, state_indices
+from project.cfpq.engines import is_source_aware, run_engine
+from project.cfpq.matrix_prod import multi_source_mprod_based_algorithm
+from project.graphs.labeled_graph import LabeledGraph
+from project.results.results import PairsResult, TriplesResult
+
+# per-worker view of the graph matrices, attached once by the pool initializer
+_shared_graph: Dict[str, Any] = dict()
+
+
+def sharded_cfpq(
+    graph: Union[MultiDiGraph, LabeledGraph],
+    cfg: CFG,
+    algorithm: Callable = multi_source_mprod_based_algorithm,
+    start_variable: Variable = Variable("S"),
+    start_vertices: "Set | None" = None,
+    final_vertices: "Set | None" = None,
+    block_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> PairsResult:
+    # blocks of sources are solved in parallel by a source-aware engine; any
+    # other engine computes all pairs anyway, so it runs once without sharding
+    max_workers = max_workers or os.cpu_count() or 1
+    if not is_source_aware(algorithm) or max_workers == 1:
+        return _solve_serially(
+            graph, cfg, algorithm, start_variable, start_vertices, final_vertices
+        )
+
+    decomposed_graph = DecomposedFA.from_graph(graph)
+    nodes = list(decomposed_graph.states_with_indices.keys())
+    num_nodes = decomposed_graph.num_states
+    sources = (
+        state_indices(decomposed_graph.states_with_indices, start_vertices)
+        if start_vertices
+        else np.arange(num_nodes, dtype=np.int64)
+    )
+
+    # every block repeats the work shared by its sources, so by default there
+    # is one block per worker
+    if block_size is None:
+        block_size = max(1, -(-len(sources) // max_workers))
+    blocks = [sources[i : i + block_size] for i in range(0, len(sources), block_size)]
+    if len(blocks) <= 1:
+        return _solve_serially(
+            graph, cfg, algorithm, start_variable, start_vertices, final_vertices
+        )
+
+    labels = list(decomposed_graph.matrices.keys())
+    matrices = [decomposed_graph.matrices[label] for label in labels]
+    indptr = _to_shared(
+        np.concatenate(
+            [matrix.indptr for matrix in matrices] + [np.empty(0, dtype=np.int64)]
+        ).astype(np.int64)
+    )
+    indices = _to_shared(
+        np.concatenate(
+            [matrix.indices for matrix in matrices] + [np.empty(0, dtype=np.int64)]
+        ).astype(np.int64)
+    )
+    meta = (
+        labels,
+        np.cumsum([0] + [matrix.nnz for matrix in matrices]).tolist(),
+        num_nodes,
+    )
+
+    block_rows: List[np.ndarray] = [np.empty(0, dtype=np.int64)]
+    block_cols: List[np.ndarray] = [np.empty(0, dtype=np.int64)]
+    try:
+        with ProcessPoolExecutor(
+            max_workers,
+            initializer=_attach_graph,
+            initargs=(indptr[0].name, indptr[1], indices[0].name, indices[1], meta),
+        ) as executor:
+            futures = [
+                executor.submit(_solve_block, block, algorithm, cfg, start_variable)
+                for block in blocks
+            ]
+            for future in futures:
+                rows, cols = future.result()
+                block_rows.append(rows)
+                block_cols.append(cols)
+    finally:
+        for shm, _ in (indptr, indices):
+            shm.close()
+            shm.unlink()
+
+    rows, cols = np.concatenate(block_rows), np.concatenate(block_cols)
+    result = PairsResult(
+        csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)),
+            shape=(num_nodes, num_nodes),
+            dtype=bool,
+        ),
+        nodes,
+    )
+    return result.restrict(targets=final_vertices) if final_vertices else result
+
+
+def _solve_serially(
+    graph: Union[MultiDiGraph, LabeledGraph],
+    cfg: CFG,
+    algorithm: Callable,
+    start_variable: Variable,
+    start_vertices: "Set | None",
+    final_vertices: "Set | None",
+) -> PairsResult:
+    result: TriplesResult = run_engine(
+        algorithm, graph, cfg, start_vertices, start_variable
+    )
+    return result[start_variable].restrict(
+        start_vertices or None, final_vertices or None
+    )
+
+
+def _to_shared(array: np.ndarray) -> Tuple[SharedMemory, int]:
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, len(array)
+
+
+def _attach_graph(
+    indptr_name: str,
+    indptr_len: int,
+    indices_name: str,
+    indices_len: int,
+    meta: Tuple[List, List[int], int],
+) -> None:
+    labels, offsets, num_nodes = meta
+    indptr_shm = SharedMemory(name=indptr_name)
+    indices_shm = SharedMemory(name=indices_name)
+    indptr = np.ndarray((indptr_len,), dtype=np.int64, buffer=indptr_shm.buf)
+    indices = np.ndarray((indices_len,), dtype=np.int64, buffer=indices_shm.buf)
+
+    matrices = dict()
+    for i, label in enumerate(labels):
+        label_indices = indices[offsets[i] : offsets[i + 1]]
+        matrices[label] = csr_matrix(
+            (
+                np.ones(len(label_indices), dtype=bool),
+                label_indices,
+                indptr[i * (num_nodes + 1) : (i + 1) * (num_nodes + 1)],
+            ),
+            shape=(num_nodes, num_nodes),
+            dtype=bool,
+        )
+
+    adjacency = csr_matrix((num_nodes, num_nodes), dtype=bool)
+    for matrix in matrices.values():
+        adjacency += matrix
+
+    # keep the segments referenced for the lifetime of the worker
+    _shared_graph.update(
+        shm=(indptr_shm, indices_shm),
+        matrices=matrices,
+        adjacency=adjacency,
+        num_nodes=num_nodes,
+    )
+
+
+def _solve_block(
+    block: np.ndarray, algorithm: Callable, cfg: CFG, start_variable: Variable
+) -> Tuple[np.ndarray, np.ndarray]:
+    # answers from the block only depend on the subgraph reachable from it
+    reachable = _reachable_from(_shared_graph["adjacency"], block)
+    labels = list(_shared_graph["matrices"].keys())
+    edges = [
+        _shared_graph["matrices"][label][reachable][:, reachable].nonzero()
+        for label in labels
+    ]
+    subgraph = LabeledGraph(
+        range(len(reachable)),
+        labels,
+        np.concatenate([v_from for v_from, _ in edges] + [np.empty(0, dtype=np.int64)]),
+        np.concatenate([v_to for _, v_to in edges] + [np.empty(0, dtype=np.int64)]),
+        np.repeat(np.arange(len(labels)), [len(v_from) for v_from, _ in edges]),
+    )
+
+    local_block = np.searchsorted(reachable, block).tolist()
+    result = run_engine(algorithm, subgraph, cfg, set(local_block), start_variable)[
+        start_variable
+    ].restrict(sources=local_block)
+    rows, cols = result.to_arrays()
+    result_nodes = reachable[np.array(result.nodes, dtype=np.int64)]
+    return result_nodes[rows], result_nodes[cols]
+
+
+def _reachable_from(adjacency: csr_matrix, sources: np.ndarray) -> np.ndarray:
+    visited = indicator(sources, adjacency.shape[0])
+    frontier = sources
+    while len(frontier) > 0:
+        successors = np.unique(adjacency[frontier].indices)
+        frontier = successors[~visited[successors]]
+        visited[frontier] = True
+
+    return np.flatnonzero(visited)
@@ -1,149 +1,227 @@
 from networkx import MultiDiGraph
 from pyformlang.cfg import CFG
-from scipy.sparse import csr_matrix
-from typing import Set
-import pycubool as pcb
+from scipy.sparse import csr_matrix, identity, kron
+from typing import List, Tuple
+import numpy as np
 
+from project.automata.backends import get_backend
 from project.automata.decomposed_fa import DecomposedFA
-from project.automata.cb_decomposed_fa import CbDecomposedFA
-from project.automata.rsm import RecursiveStateMachine
-from project.automata.utils import graph_to_nfa
-from project.cfg.ecfg import ECFG
+from project.cache.query_cache import query_cache
+from project.results.results import TriplesResult
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
 
 
 def tensor_based(
     graph: MultiDiGraph,
     cfg: CFG,
-) -> Set:
-    graph_decomposed = DecomposedFA.from_fa(graph_to_nfa(graph))
-    rsm = RecursiveStateMachine.from_ecfg(ECFG.from_cfg(cfg))
-    rsm_decomposed = DecomposedFA.from_rsm(rsm)
-
-    for production in cfg.productions:
-        if len(production.body) != 0:
-            continue
-
-        variable = production.head
-        if variable not in graph_decomposed.matrices:
-            graph_decomposed.matrices[variable] = csr_matrix(
-                (graph_decomposed.num_states, graph_decomposed.num_states), dtype=bool
-            )
-
-        for vertice in range(graph_decomposed.num_states):
-            graph_decomposed.matrices[variable][vertice, vertice] = True
-
-    transitive_closure = csr_matrix(
-        (graph_decomposed.num_states, graph_decomposed.num_states), dtype=bool
-    )
-    matrix_changed = True
-    states_by_indices = {
-        i: state for state, i in rsm_decomposed.states_with_indices.items()
-    }
-    while matrix_changed:
-        matrix_changed = False
-
-        prev_nnz = transitive_closure.nnz
-        transitive_closure = rsm_decomposed.intersect(
-            graph_decomposed
-        ).transitive_closure()
-        matrix_changed |= prev_nnz != transitive_closure.nnz
-
-        for idx_from, idx_to in zip(*transitive_closure.nonzero()):
-            state_from = states_by_indices[idx_from // graph_decomposed.num_states]
-            variable = state_from.value[0]
-
-            if variable not in cfg.variables:
+    backend: str = "sparse",
+) -> TriplesResult:
+    ops = get_backend(backend)
+    with phase("tensor.graph_to_matrices"):
+        graph_decomposed = DecomposedFA.from_graph(graph, backend=backend)
+    with phase("tensor.cfg_to_rsm"):
+        rsm_decomposed = query_cache.decomposed_rsm(cfg).with_backend(backend)
+    num_nodes = graph_decomposed.num_states
+
+    if num_nodes == 0:
+        return TriplesResult(dict(), [])
+
+    with phase("tensor.init"):
+        for production in cfg.productions:
+            if len(production.body) != 0:
                 continue
 
-            state_to = states_by_indices[idx_to // graph_decomposed.num_states]
-            if (
-                state_from in rsm_decomposed.start_states
-                and state_to in rsm_decomposed.final_states
-            ):
-                if variable not in graph_decomposed.matrices:
-                    graph_decomposed.matrices[variable] = csr_matrix(
-                        (graph_decomposed.num_states, graph_decomposed.num_states),
-                        dtype=bool,
-                    )
-
-                graph_decomposed.matrices[variable][
-                    idx_from % graph_decomposed.num_states,
-                    idx_to % graph_decomposed.num_states,
-                ] = True
+            graph_decomposed.matrices[production.head] = ops.ewise_add(
+                graph_decomposed.matrices.get(
+                    production.head, ops.empty((num_nodes, num_nodes))
+                ),
+                ops.identity(num_nodes),
+            )
 
-    return set(
-        (variable, v_from, v_to)
-        for variable, matrix in graph_decomposed.matrices.items()
-        for v_from, v_to in zip(*matrix.nonzero())
-        if variable in cfg.variables
-    )
+        variables, variables_of_states, is_start, is_final = _rsm_state_arrays(
+            rsm_decomposed, cfg
+        )
+
+    with phase("tensor.fixpoint"):
+        closure_nnz = 0
+        matrix_changed = True
+        while matrix_changed:
+            count_iteration("tensor", closure_nnz)
+
+            with phase("tensor.intersect"):
+                intersection = rsm_decomposed.intersect(graph_decomposed)
+            with phase("tensor.transitive_closure"):
+                transitive_closure = intersection.transitive_closure()
+            matrix_changed = closure_nnz != ops.nnz(transitive_closure)
+            closure_nnz = ops.nnz(transitive_closure)
+
+            idx_from, idx_to = ops.to_lists(transitive_closure)
+            r_from, g_from = np.divmod(idx_from, num_nodes)
+            r_to, g_to = np.divmod(idx_to, num_nodes)
+            accepted = is_start[r_from] & is_final[r_to]
+            accepted_variables = variables_of_states[r_from[accepted]]
+            g_from, g_to = g_from[accepted], g_to[accepted]
+
+            for variable_idx in np.unique(accepted_variables):
+                variable = variables[variable_idx]
+                selected = accepted_variables == variable_idx
+                found = ops.from_lists(
+                    (num_nodes, num_nodes), g_from[selected], g_to[selected]
+                )
+                graph_decomposed.matrices[variable] = (
+                    ops.ewise_add(graph_decomposed.matrices[variable], found)
+                    if variable in graph_decomposed.matrices
+                    else found
+                )
+
+    with phase("tensor.extract_result"):
+        return TriplesResult(
+            {
+                variable: matrix
+                for variable, matrix in graph_decomposed.matrices.items()
+                if variable in cfg.variables
+            },
+            list(graph_decomposed.states_with_indices.keys()),
+        )
 
 
 def cb_tensor_based(
     graph: MultiDiGraph,
     cfg: CFG,
-) -> Set:
-    graph_decomposed = CbDecomposedFA.from_fa(graph_to_nfa(graph))
-    rsm = RecursiveStateMachine.from_ecfg(ECFG.from_cfg(cfg))
-    rsm_decomposed = CbDecomposedFA.from_rsm(rsm)
-
-    if graph_decomposed.num_states == 0:
-        return set()
-
-    for production in cfg.productions:
-        if len(production.body) != 0:
-            continue
-
-        variable = production.head
-        if variable not in graph_decomposed.matrices:
-            graph_decomposed.matrices[variable] = pcb.Matrix.empty(
-                shape=(graph_decomposed.num_states, graph_decomposed.num_states)
-            )
+) -> TriplesResult:
+    return tensor_based(graph, cfg, backend="cubool")
 
-        for vertice in range(graph_decomposed.num_states):
-            graph_decomposed.matrices[variable][vertice, vertice] = True
 
-    transitive_closure = pcb.Matrix.empty(
-        shape=(graph_decomposed.num_states, graph_decomposed.num_states)
-    )
-    matrix_changed = True
-    states_by_indices = {
-        i: state for state, i in rsm_decomposed.states_with_indices.items()
-    }
-    while matrix_changed:
-        matrix_changed = False
-
-        prev_nnz = transitive_closure.nvals
-        transitive_closure = rsm_decomposed.intersect(
-            graph_decomposed
-        ).transitive_closure()
-        matrix_changed |= prev_nnz != transitive_closure.nvals
-
-        for idx_from, idx_to in transitive_closure:
-            state_from = states_by_indices[idx_from // graph_decomposed.num_states]
-            variable = state_from.value[0]
-
-            if variable not in cfg.variables:
+def incremental_tensor_based(
+    graph: MultiDiGraph,
+    cfg: CFG,
+) -> TriplesResult:
+    with phase("incremental_tensor.graph_to_matrices"):
+        graph_decomposed = DecomposedFA.from_graph(graph)
+    with phase("incremental_tensor.cfg_to_rsm"):
+        rsm_decomposed = query_cache.decomposed_rsm(cfg)
+    num_nodes = graph_decomposed.num_states
+
+    with phase("incremental_tensor.init"):
+        for production in cfg.productions:
+            if len(production.body) != 0:
                 continue
 
-            state_to = states_by_indices[idx_to // graph_decomposed.num_states]
-            if (
-                state_from in rsm_decomposed.start_states
-                and state_to in rsm_decomposed.final_states
-            ):
-                if variable not in graph_decomposed.matrices:
-                    graph_decomposed.matrices[variable] = pcb.Matrix.empty(
-                        (graph_decomposed.num_states, graph_decomposed.num_states)
+            variable = production.head
+            graph_decomposed.matrices[variable] = graph_decomposed.matrices.get(
+                variable, csr_matrix((num_nodes, num_nodes), dtype=bool)
+            ) + identity(num_nodes, dtype=bool, format="csr")
+
+        variables, variables_of_states, is_start, is_final = _rsm_state_arrays(
+            rsm_decomposed, cfg
+        )
+
+    with phase("incremental_tensor.fixpoint"):
+        num_states = rsm_decomposed.num_states * num_nodes
+        transitive_closure = csr_matrix((num_states, num_states), dtype=bool)
+        deltas = dict(graph_decomposed.matrices)
+        while len(deltas) > 0:
+            count_iteration("incremental_tensor", transitive_closure.nnz)
+            with phase("incremental_tensor.kron"):
+                delta_product = csr_matrix((num_states, num_states), dtype=bool)
+                for label, delta in deltas.items():
+                    if label in rsm_decomposed.matrices:
+                        delta_product += kron(
+                            rsm_decomposed.matrices[label], delta, format="csr"
+                        )
+
+            with phase("incremental_tensor.transitive_closure"):
+                transitive_closure, new_pairs = _extend_transitive_closure(
+                    transitive_closure, delta_product
+                )
+
+            idx_from, idx_to = new_pairs.nonzero()
+            r_from, g_from = np.divmod(idx_from, num_nodes)
+            r_to, g_to = np.divmod(idx_to, num_nodes)
+            accepted = is_start[r_from] & is_final[r_to]
+            accepted_variables = variables_of_states[r_from[accepted]]
+            g_from, g_to = g_from[accepted], g_to[accepted]
+
+            deltas = dict()
+            for variable_idx in np.unique(accepted_variables):
+                variable = variables[variable_idx]
+                selected = accepted_variables == variable_idx
+                matrix = graph_decomposed.matrices.get(
+                    variable, csr_matrix((num_nodes, num_nodes), dtype=bool)
+                )
+                delta = (
+                    csr_matrix(
+                        (
+                            np.ones(selected.sum(), dtype=bool),
+                            (g_from[selected], g_to[selected]),
+                        ),
+                        shape=(num_nodes, num_nodes),
+                        dtype=bool,
                     )
-
-                graph_decomposed.matrices[variable][
-                    idx_from % graph_decomposed.num_states,
-                    idx_to % graph_decomposed.num_states,
-                ] = True
-
-    return set(
-        (variable, v_from, v_to)
-        for variable, matrix in graph_decomposed.matrices.items()
-        for v_from, v_to in matrix
-        if variable in cfg.variables
+                    > matrix
+                )
+                if delta.nnz > 0:
+                    deltas[variable] = delta
+                    graph_decomposed.matrices[variable] = matrix + delta
+
+    with phase("incremental_tensor.extract_result"):
+        return TriplesResult(
+            {
+                variable: matrix
+                for variable, matrix in graph_decomposed.matrices.items()
+                if variable in cfg.variables
+            },
+            list(graph_decomposed.states_with_indices.keys()),
+        )
+
+
+def _rsm_state_arrays(
+    rsm_decomposed: DecomposedFA, cfg: CFG
+) -> Tuple[List, np.ndarray, np.ndarray, np.ndarray]:
+    # variable index, start and final flags of every rsm state index
+    states_by_indices = {
+        i: state for state, i in rsm_decomposed.states_with_indices.items()
+    }
+    variables = list(cfg.variables)
+    variables_of_states = np.array(
+        [
+            variables.index(states_by_indices[i].value[0])
+            for i in range(rsm_decomposed.num_states)
+        ],
+        dtype=np.int64,
+    )
+    is_start = np.array(
+        [
+            states_by_indices[i] in rsm_decomposed.start_states
+            for i in range(rsm_decomposed.num_states)
+        ],
+        dtype=bool,
+    )
+    is_final = np.array(
+        [
+            states_by_indices[i] in rsm_decomposed.final_states
+            for i in range(rsm_decomposed.num_states)
+        ],
+        dtype=bool,
     )
+    return variables, variables_of_states, is_start, is_final
+
+
+def _extend_transitive_closure(
+    transitive_closure: csr_matrix, delta: csr_matrix
+) -> Tuple[csr_matrix, csr_matrix]:
+    # pairs connected by a path that uses exactly one new edge
+    left = delta + transitive_closure @ delta
+    new_pairs = (left + left @ transitive_closure) > transitive_closure
+    result = transitive_closure + new_pairs
+
+    # paths that use several new edges
+    frontier = new_pairs
+    while frontier.nnz > 0:
+        count_iteration("incremental_tensor.closure", result.nnz)
+        frontier = (frontier @ result + result @ frontier) > result
+        result += frontier
+        new_pairs += frontier
+
+    return result, new_pairs
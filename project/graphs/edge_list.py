@@ -0,0 +1,124 @@
+from typing import Any, Dict, Iterator, List, Set, Tuple
+import io
+import mmap
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 1 << 26
+
+
+class _Interner:
+    # numbers the tokens of one column in the order they are first seen
+    def __init__(self) -> None:
+        self.indices: Dict[str, int] = dict()
+
+    def __call__(self, tokens: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize(tokens)
+        numbers = np.array(
+            [self.indices.setdefault(token, len(self.indices)) for token in uniques],
+            dtype=np.int32,
+        )
+        return np.asarray(numbers[codes])
+
+    def values(self) -> List[Any]:
+        # a column of numeric tokens holds numbers, as pd.read_csv infers it
+        # for each column in cfpq_data.graph_from_csv
+        tokens = list(self.indices)
+        try:
+            return list(pd.to_numeric(pd.Series(tokens, dtype=object)).tolist())
+        except (ValueError, TypeError):
+            return tokens
+
+
+def _merge(*columns: _Interner) -> Tuple[List[Any], List[np.ndarray]]:
+    # values of columns sharing a namespace after conversion, and for every
+    # column the map from its token numbers to indices of these values
+    indices: Dict[Any, int] = dict()
+    maps = [
+        np.array(
+            [indices.setdefault(value, len(indices)) for value in column.values()],
+            dtype=np.int32,
+        )
+        for column in columns
+    ]
+    return list(indices), maps
+
+
+def iter_edge_chunks(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # (v_from, v_to, label) token arrays of the "v_from v_to label" lines of the
+    # file, read through a memory map in pieces of about chunk_size bytes
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        start = 0
+        while start < len(data):
+            end = min(start + chunk_size, len(data))
+            if end < len(data):
+                line_end = data.find(b"\n", end - 1)
+                end = len(data) if line_end == -1 else line_end + 1
+
+            buffer, start = data[start:end], end
+            try:
+                chunk = pd.read_csv(
+                    io.BytesIO(buffer),
+                    sep=" ",
+                    header=None,
+                    names=["from", "to", "label"],
+                    dtype=str,
+                    keep_default_na=False,
+                    engine="c",
+                )
+            except pd.errors.EmptyDataError:
+                continue
+
+            yield (
+                chunk["from"].to_numpy(),
+                chunk["to"].to_numpy(),
+                chunk["label"].to_numpy(),
+            )
+
+
+def read_edge_list(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[List[Any], List[Any], np.ndarray, np.ndarray, np.ndarray]:
+    # nodes, labels and the interned source, target and label of every edge
+    from_tokens, to_tokens, label_tokens = _Interner(), _Interner(), _Interner()
+    sources, targets, edge_labels = [], [], []
+    for v_from, v_to, label in iter_edge_chunks(path, chunk_size):
+        sources.append(from_tokens(v_from))
+        targets.append(to_tokens(v_to))
+        edge_labels.append(label_tokens(label))
+
+    nodes, (sources_map, targets_map) = _merge(from_tokens, to_tokens)
+    labels, (labels_map,) = _merge(label_tokens)
+    empty = [np.empty(0, dtype=np.int32)]
+    return (
+        nodes,
+        labels,
+        sources_map[np.concatenate(sources + empty)],
+        targets_map[np.concatenate(targets + empty)],
+        labels_map[np.concatenate(edge_labels + empty)],
+    )
+
+
+def edge_list_info(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[int, int, Set[Any]]:
+    # vertex count, edge count and labels in one pass, keeping no edges
+    from_tokens, to_tokens, label_tokens = _Interner(), _Interner(), _Interner()
+    num_edges = 0
+    for v_from, v_to, label in iter_edge_chunks(path, chunk_size):
+        from_tokens(v_from)
+        to_tokens(v_to)
+        label_tokens(label)
+        num_edges += len(label)
+
+    nodes, _ = _merge(from_tokens, to_tokens)
+    labels, _ = _merge(label_tokens)
+    return len(nodes), num_edges, set(labels)
@@ -2,6 +2,9 @@ from dataclasses import dataclass
 from typing import Any, Set
 import cfpq_data
 
+from project.graphs.edge_list import edge_list_info
+from project.graphs.graph_store import GraphStore
+
 
 @dataclass
 class GraphInfo:
@@ -10,12 +13,11 @@ class GraphInfo:
     labels: Set[Any]
 
 
-def get_graph_info(name: str) -> GraphInfo:
+def get_graph_info(name: str, store: "GraphStore | None" = None) -> GraphInfo:
     path = cfpq_data.download(name)
-    graph = cfpq_data.graph_from_csv(path)
 
-    return GraphInfo(
-        graph.number_of_nodes(),
-        graph.number_of_edges(),
-        set(cfpq_data.get_sorted_labels(graph)),
-    )
+    if store is not None:
+        meta = store.load_meta(store.save_csv(path))
+        return GraphInfo(len(meta["nodes"]), meta["num_edges"], set(meta["labels"]))
+
+    return GraphInfo(*edge_list_info(path))
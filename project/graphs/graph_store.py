@@ -0,0 +1,196 @@
+from networkx import MultiDiGraph
+from scipy.sparse import csr_matrix
+from typing import Any, Dict, Set, Tuple, Union
+import hashlib
+import numpy as np
+import os
+import pickle
+import shutil
+import tempfile
+
+from project.automata.decomposed_fa import DecomposedFA
+from project.graphs.labeled_graph import LabeledGraph, edges_by_label, node_indices
+
+# a graph, its preloaded matrices or the (store, key) it was saved under
+GraphSource = Union[MultiDiGraph, LabeledGraph, DecomposedFA, Tuple["GraphStore", str]]
+
+
+def graph_hash(graph: Union[MultiDiGraph, LabeledGraph]) -> str:
+    # independent of node and edge order: nodes are ranked by repr and the edges
+    # of every label are hashed as a sorted array of ranked (v_from, v_to) cells
+    node_reprs = [repr(node) for node in node_indices(graph)]
+    order = np.argsort(np.array(node_reprs, dtype=object), kind="stable")
+    ranks = np.empty(len(node_reprs), dtype=np.int64)
+    ranks[order] = np.arange(len(node_reprs))
+
+    hasher = hashlib.sha256()
+    for i in order.tolist():
+        hasher.update(node_reprs[i].encode())
+        hasher.update(b"\0")
+
+    hasher.update(b"\1")
+    labels = sorted(
+        ((repr(label), edges) for label, edges in edges_by_label(graph).items()),
+        key=lambda item: item[0],
+    )
+    for label, (rows, cols) in labels:
+        hasher.update(label.encode())
+        hasher.update(b"\0")
+        cells = np.sort(ranks[rows] * len(node_reprs) + ranks[cols])
+        hasher.update(cells.astype("<i8").tobytes())
+
+    return hasher.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+class GraphStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._meta_path(key))
+
+    def save(
+        self, graph: Union[MultiDiGraph, LabeledGraph], key: "str | None" = None
+    ) -> str:
+        if key is None:
+            key = graph_hash(graph)
+        if self.contains(key):
+            return key
+
+        decomposed_graph = DecomposedFA.from_graph(graph)
+        labels = list(decomposed_graph.matrices.keys())
+        meta = {
+            "nodes": list(decomposed_graph.states_with_indices.keys()),
+            "labels": labels,
+            # edges without a label are not stored
+            "num_edges": sum(len(rows) for rows, _ in edges_by_label(graph).values()),
+        }
+
+        # write into a temporary directory so that readers never see partial data
+        tmp_dir = tempfile.mkdtemp(dir=self.root)
+        try:
+            for i, label in enumerate(labels):
+                matrix = decomposed_graph.matrices[label]
+                matrix.sort_indices()
+                # the index dtype csr_matrix keeps on load, so it maps them as is
+                dtype = _index_dtype(matrix.nnz, decomposed_graph.num_states)
+                np.save(
+                    os.path.join(tmp_dir, f"{i}.indptr.npy"),
+                    matrix.indptr.astype(dtype, copy=False),
+                )
+                np.save(
+                    os.path.join(tmp_dir, f"{i}.indices.npy"),
+                    matrix.indices.astype(dtype, copy=False),
+                )
+
+            with open(os.path.join(tmp_dir, "meta.pkl"), "wb") as file:
+                pickle.dump(meta, file)
+
+            os.replace(tmp_dir, os.path.join(self.root, key))
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not self.contains(key):
+                raise
+
+        return key
+
+    def load(
+        self, key: str, start_states: Set = set(), final_states: Set = set()
+    ) -> DecomposedFA:
+        if not self.contains(key):
+            raise KeyError(key)
+
+        meta = self.load_meta(key)
+        num_nodes = len(meta["nodes"])
+
+        result = DecomposedFA()
+        result.num_states = num_nodes
+        result.states_with_indices = {node: i for i, node in enumerate(meta["nodes"])}
+        result.start_states = set(start_states) if start_states else set(meta["nodes"])
+        result.final_states = set(final_states) if final_states else set(meta["nodes"])
+
+        for i, label in enumerate(meta["labels"]):
+            indptr = np.load(self._path(key, f"{i}.indptr.npy"), mmap_mode="r")
+            indices = np.load(self._path(key, f"{i}.indices.npy"), mmap_mode="r")
+            result.matrices[label] = csr_matrix(
+                (np.ones(len(indices), dtype=bool), indices, indptr),
+                shape=(num_nodes, num_nodes),
+                dtype=bool,
+                copy=False,
+            )
+
+        return result
+
+    def load_meta(self, key: str) -> Dict[str, Any]:
+        with open(self._meta_path(key), "rb") as file:
+            meta: Dict[str, Any] = pickle.load(file)
+
+        return meta
+
+    def load_csv(
+        self, path: str, start_states: Set = set(), final_states: Set = set()
+    ) -> DecomposedFA:
+        return self.load(self.save_csv(path), start_states, final_states)
+
+    def save_csv(self, path: str) -> str:
+        key = file_hash(path)
+        if not self.contains(key):
+            self.save(LabeledGraph.from_csv(path), key)
+
+        return key
+
+    def _path(self, key: str, filename: str) -> str:
+        return os.path.join(self.root, key, filename)
+
+    def _meta_path(self, key: str) -> str:
+        return self._path(key, "meta.pkl")
+
+
+def decomposed_graph(
+    graph: GraphSource, start_states: Set = set(), final_states: Set = set()
+) -> DecomposedFA:
+    # stored and preloaded matrices are used as they are, only graphs are decomposed
+    if isinstance(graph, tuple):
+        store: GraphStore = graph[0]
+        return store.load(graph[1], start_states, final_states)
+    if isinstance(graph, DecomposedFA):
+        return graph.with_states(start_states, final_states)
+
+    return DecomposedFA.from_graph(graph, start_states, final_states)
+
+
+def labeled_graph(graph: GraphSource) -> Union[MultiDiGraph, LabeledGraph]:
+    # the edges of stored and preloaded matrices for engines that take graphs
+    if isinstance(graph, tuple):
+        graph = decomposed_graph(graph)
+    if not isinstance(graph, DecomposedFA):
+        return graph
+
+    nodes = [None] * graph.num_states
+    for node, i in graph.states_with_indices.items():
+        nodes[i] = node
+
+    labels = list(graph.matrices.keys())
+    edges = [graph.backend.to_lists(graph.matrices[label]) for label in labels]
+    empty = [np.empty(0, dtype=np.int64)]
+    return LabeledGraph(
+        nodes,
+        labels,
+        np.concatenate([rows for rows, _ in edges] + empty),
+        np.concatenate([cols for _, cols in edges] + empty),
+        np.repeat(np.arange(len(labels)), [len(rows) for rows, _ in edges]),
+    )
+
+
+def _index_dtype(nnz: int, num_nodes: int) -> type:
+    return np.int32 if max(nnz, num_nodes) <= np.iinfo(np.int32).max else np.int64
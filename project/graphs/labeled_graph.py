@@ -0,0 +1,175 @@
+from networkx import MultiDiGraph
+from scipy.sparse import csr_matrix
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+from project.graphs.edge_list import DEFAULT_CHUNK_SIZE, read_edge_list
+
+
+class LabeledGraph:
+    # edge-labelled multigraph with vertices interned to int32 and labels to small
+    # ints, edges are sorted by (label, v_from, v_to) so that the edges of label i
+    # are the slice label_offsets[i]:label_offsets[i + 1] of the edge arrays;
+    # it provides the part of the MultiDiGraph interface the engines use
+    def __init__(
+        self,
+        nodes: Sequence,
+        labels: Sequence,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        edge_labels: np.ndarray,
+    ):
+        self.nodes = list(nodes)
+        self.labels = list(labels)
+        self._node_indices: Optional[Dict[Any, int]] = None
+
+        order = np.lexsort((targets, sources, edge_labels))
+        self.sources = np.asarray(sources, dtype=np.int32)[order]
+        self.targets = np.asarray(targets, dtype=np.int32)[order]
+        self.edge_labels = np.asarray(edge_labels)[order].astype(
+            np.int16 if len(self.labels) < 2**15 else np.int32
+        )
+        self.label_offsets = np.searchsorted(
+            self.edge_labels, np.arange(len(self.labels) + 1)
+        )
+
+    @staticmethod
+    def from_edges(
+        v_from: Sequence, v_to: Sequence, labels: Sequence, nodes: Sequence = ()
+    ) -> "LabeledGraph":
+        # nodes lists vertices to number first, e.g. isolated ones
+        columns = [pd.Series(column) for column in (nodes, v_from, v_to)]
+        node_codes, node_values = pd.factorize(
+            pd.concat([column for column in columns if len(column) > 0])
+            if len(columns[0]) + len(columns[1]) > 0
+            else pd.Series([], dtype=object)
+        )
+        label_codes, label_values = pd.factorize(pd.Series(labels, dtype=object))
+        num_nodes, num_edges = len(columns[0]), len(columns[1])
+
+        return LabeledGraph(
+            node_values.tolist(),
+            label_values.tolist(),
+            node_codes[num_nodes : num_nodes + num_edges],
+            node_codes[num_nodes + num_edges :],
+            label_codes,
+        )
+
+    @staticmethod
+    def from_networkx(graph: MultiDiGraph) -> "LabeledGraph":
+        edges = [
+            (v_from, v_to, label)
+            for v_from, v_to, label in graph.edges(data="label")
+            if label is not None
+        ]
+        v_from, v_to, labels = zip(*edges) if len(edges) > 0 else ((), (), ())
+        return LabeledGraph.from_edges(v_from, v_to, labels, list(graph.nodes))
+
+    @staticmethod
+    def from_csv(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> "LabeledGraph":
+        # the "v_from v_to label" format of cfpq_data.graph_from_csv
+        return LabeledGraph(*read_edge_list(path, chunk_size))
+
+    def to_networkx(self) -> MultiDiGraph:
+        result = MultiDiGraph()
+        result.add_nodes_from(self.nodes)
+        result.add_edges_from(
+            (v_from, v_to, {"label": label})
+            for v_from, v_to, label in self.edges(data="label")
+        )
+        return result
+
+    def to_csv(self, path: str) -> None:
+        with open(path, "w") as file:
+            for v_from, v_to, label in self.edges(data="label"):
+                file.write(f"{v_from} {v_to} {label}\n")
+
+    @property
+    def node_indices(self) -> Dict[Any, int]:
+        if self._node_indices is None:
+            self._node_indices = {node: i for i, node in enumerate(self.nodes)}
+        return self._node_indices
+
+    def number_of_nodes(self) -> int:
+        return len(self.nodes)
+
+    def number_of_edges(self) -> int:
+        return len(self.sources)
+
+    def edges(self, data: str = "label") -> Iterator[Tuple[Any, Any, Any]]:
+        if data != "label":
+            raise ValueError(f"Only label data is stored, got: {data}")
+
+        for label_idx, label in enumerate(self.labels):
+            start, end = self.label_offsets[label_idx : label_idx + 2]
+            for i, j in zip(
+                self.sources[start:end].tolist(), self.targets[start:end].tolist()
+            ):
+                yield self.nodes[i], self.nodes[j], label
+
+    def label_edges(self, label: Any) -> Tuple[np.ndarray, np.ndarray]:
+        if label not in self.labels:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+        label_idx = self.labels.index(label)
+        start, end = self.label_offsets[label_idx : label_idx + 2]
+        return self.sources[start:end], self.targets[start:end]
+
+    def label_matrix(self, label: Any) -> csr_matrix:
+        # edges of a label are sorted by source, so indptr is a prefix sum
+        num_nodes = len(self.nodes)
+        sources, targets = self.label_edges(label)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        result = csr_matrix(
+            (np.ones(len(targets), dtype=bool), targets, indptr),
+            shape=(num_nodes, num_nodes),
+            dtype=bool,
+        )
+        result.sum_duplicates()
+        return result
+
+    def label_matrices(self) -> Dict[Any, csr_matrix]:
+        return {label: self.label_matrix(label) for label in self.labels}
+
+    def subgraph(self, vertices: np.ndarray) -> "LabeledGraph":
+        # the subgraph induced by sorted vertex indices, renumbered to 0..k-1
+        kept = np.zeros(len(self.nodes), dtype=bool)
+        kept[vertices] = True
+        edges = kept[self.sources] & kept[self.targets]
+        return LabeledGraph(
+            [self.nodes[i] for i in vertices.tolist()],
+            self.labels,
+            np.searchsorted(vertices, self.sources[edges]),
+            np.searchsorted(vertices, self.targets[edges]),
+            self.edge_labels[edges],
+        )
+
+
+def node_indices(graph: Union[MultiDiGraph, LabeledGraph]) -> Dict[Any, int]:
+    if isinstance(graph, LabeledGraph):
+        return graph.node_indices
+    return {node: i for i, node in enumerate(graph.nodes)}
+
+
+def edges_by_label(
+    graph: Union[MultiDiGraph, LabeledGraph]
+) -> Dict[Any, Tuple[np.ndarray, np.ndarray]]:
+    # source and target indices of the edges of every label, vertices are
+    # numbered in the order of graph.nodes
+    if isinstance(graph, LabeledGraph):
+        return {label: graph.label_edges(label) for label in graph.labels}
+
+    nodes = node_indices(graph)
+    indices: Dict[Any, Tuple[list, list]] = dict()
+    for v_from, v_to, label in graph.edges(data="label"):
+        if label is not None:
+            rows, cols = indices.setdefault(label, ([], []))
+            rows.append(nodes[v_from])
+            cols.append(nodes[v_to])
+
+    return {
+        label: (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))
+        for label, (rows, cols) in indices.items()
+    }
@@ -0,0 +1,350 @@
+from collections import Counter, defaultdict
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from pyformlang.regular_expression import Regex
+from scipy.sparse import csr_matrix
+from typing import Any, Dict, Iterable, List, Set, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+from project.automata.decomposed_fa import indicator, pair_indices, state_indices
+from project.cache.query_cache import query_cache
+from project.cfpq.matrix_prod import _select_rows, _semi_naive_fixpoint, _total_nnz
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
+from project.results.results import PairsResult, TriplesResult
+
+Edge = Tuple[Any, Any, Any]
+
+
+class EdgeStore:
+    # (v_from, v_to, label) edges with multiplicities, nodes are never removed
+    # and are numbered in order of appearance
+    def __init__(self, graph: MultiDiGraph):
+        self.nodes = list(graph.nodes)
+        self.node_indices = {node: i for i, node in enumerate(self.nodes)}
+        self.counts = Counter(
+            (v_from, v_to, label)
+            for v_from, v_to, label in graph.edges(data="label")
+            if label is not None
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    def add(self, edges: Iterable[Edge]) -> Tuple[List[Edge], List[Any]]:
+        # returns the edges that were absent and the nodes that are new
+        new_edges, new_nodes = [], []
+        for edge in edges:
+            v_from, v_to, label = edge
+            for node in (v_from, v_to):
+                if node not in self.node_indices:
+                    self.node_indices[node] = len(self.nodes)
+                    self.nodes.append(node)
+                    new_nodes.append(node)
+
+            if label is None:
+                continue
+            if self.counts[edge] == 0:
+                new_edges.append(edge)
+            self.counts[edge] += 1
+
+        return new_edges, new_nodes
+
+    def remove(self, edges: Iterable[Edge]) -> List[Edge]:
+        # returns the edges whose last copy was removed
+        edges = Counter(edges)
+        missing = edges - self.counts
+        if len(missing) > 0:
+            raise KeyError(next(iter(missing)))
+
+        self.counts -= edges
+        return [edge for edge in edges if edge not in self.counts]
+
+    def label_matrices(self, edges: Iterable[Edge]) -> Dict[Any, csr_matrix]:
+        indices: Dict[Any, Tuple[list, list]] = defaultdict(lambda: ([], []))
+        for v_from, v_to, label in edges:
+            rows, cols = indices[label]
+            rows.append(self.node_indices[v_from])
+            cols.append(self.node_indices[v_to])
+
+        return {
+            label: _from_indices((self.num_nodes, self.num_nodes), rows, cols)
+            for label, (rows, cols) in indices.items()
+        }
+
+
+class RpqSession:
+    # keeps the product states reachable from every (start vertex, regex start)
+    # pair and updates them as edges are inserted or deleted
+    def __init__(
+        self,
+        graph: MultiDiGraph,
+        regex: Regex,
+        start_states: Set = set(),
+        final_states: Set = set(),
+    ):
+        self.regex = query_cache.decomposed_regex(regex)
+        self.store = EdgeStore(graph)
+        self.start_states = set(start_states)
+        self.final_states = set(final_states)
+        self.regex_start = state_indices(
+            self.regex.states_with_indices, self.regex.start_states
+        )
+        self.is_regex_final = indicator(
+            state_indices(self.regex.states_with_indices, self.regex.final_states),
+            self.regex.num_states,
+        )
+
+        with phase("rpq_session.init"):
+            self.adjacency = self._product(self.store.counts.keys())
+            self.source_rows = np.empty(0, dtype=np.int64)
+            self.reach = csr_matrix((0, self.adjacency.shape[0]), dtype=bool)
+            self._add_sources(self.store.nodes)
+
+    def add_edges(self, edges: Iterable[Edge]) -> None:
+        with phase("rpq_session.add_edges"):
+            new_edges, new_nodes = self.store.add(edges)
+            num_states = self.store.num_nodes * self.regex.num_states
+            self.adjacency.resize((num_states, num_states))
+            self.reach.resize((len(self.source_rows), num_states))
+
+            delta = self._product(new_edges) > self.adjacency
+            self.adjacency = self.adjacency + delta
+            frontier = (delta[self.source_rows] + self.reach @ delta) > self.reach
+            self.reach = self._propagate(self.reach, frontier)
+
+            self._add_sources(new_nodes)
+
+    def remove_edges(self, edges: Iterable[Edge]) -> None:
+        # rows that may have used a deleted edge are recomputed from scratch
+        with phase("rpq_session.remove_edges"):
+            if len(self.store.remove(edges)) == 0:
+                return
+
+            adjacency = self._product(self.store.counts.keys())
+            lost = self.adjacency > adjacency
+            self.adjacency = adjacency
+            if lost.nnz == 0:
+                return
+
+            affected = np.unique(
+                (lost[self.source_rows] + self.reach @ lost).nonzero()[0]
+            )
+            recomputed = self._propagate(
+                csr_matrix((len(affected), adjacency.shape[0]), dtype=bool),
+                adjacency[self.source_rows[affected]],
+            )
+            kept = ~indicator(affected, len(self.source_rows))
+            self.reach = (
+                _select_rows(self.reach, kept)
+                + _from_indices(
+                    (len(self.source_rows), len(affected)),
+                    affected,
+                    np.arange(len(affected)),
+                )
+                @ recomputed
+            )
+
+    def result(self) -> PairsResult:
+        with phase("rpq_session.extract_result"):
+            num_nodes = self.store.num_nodes
+            is_final = (
+                indicator(
+                    state_indices(self.store.node_indices, self.final_states),
+                    num_nodes,
+                )
+                if self.final_states
+                else np.ones(num_nodes, dtype=bool)
+            )
+
+            rows, cols = self.reach.nonzero()
+            g_to, r_to = np.divmod(cols, self.regex.num_states)
+            accepted = self.is_regex_final[r_to] & is_final[g_to]
+            g_from = self.source_rows[rows[accepted]] // self.regex.num_states
+
+            return PairsResult(
+                _from_indices((num_nodes, num_nodes), g_from, g_to[accepted]),
+                self.store.nodes,
+            )
+
+    def _product(self, edges: Iterable[Edge]) -> csr_matrix:
+        # product states are numbered as in DecomposedFA.intersect of graph and regex
+        num_states = self.store.num_nodes * self.regex.num_states
+        result = csr_matrix((num_states, num_states), dtype=bool)
+        for label, matrix in self.store.label_matrices(edges).items():
+            if label in self.regex.matrices:
+                result += sp.kron(matrix, self.regex.matrices[label], format="csr")
+
+        return result
+
+    def _add_sources(self, nodes: Iterable) -> None:
+        sources = np.array(
+            [
+                self.store.node_indices[node]
+                for node in nodes
+                if not self.start_states or node in self.start_states
+            ],
+            dtype=np.int64,
+        )
+        rows = pair_indices(sources, self.regex_start, self.regex.num_states)
+        reach = self._propagate(
+            csr_matrix((len(rows), self.adjacency.shape[0]), dtype=bool),
+            self.adjacency[rows],
+        )
+        self.source_rows = np.concatenate([self.source_rows, rows])
+        self.reach = sp.vstack([self.reach, reach], format="csr", dtype=bool)
+
+    def _propagate(self, reach: csr_matrix, frontier: csr_matrix) -> csr_matrix:
+        while frontier.nnz > 0:
+            count_iteration("rpq_session", reach.nnz)
+            reach = reach + frontier
+            frontier = (frontier @ self.adjacency) > reach
+
+        return reach
+
+
+class CfpqSession:
+    # keeps the matrix-product fixpoint of every wcnf variable, insertions are
+    # propagated semi-naively and deletions use delete and rederive
+    def __init__(self, graph: MultiDiGraph, cfg: CFG):
+        self.wcnf = query_cache.wcnf_productions(cfg)
+        self.store = EdgeStore(graph)
+        self.terminal_variables: Dict[Any, List] = defaultdict(list)
+        for variable, terminal in self.wcnf.terminal_productions:
+            self.terminal_variables[terminal.value].append(variable)
+
+        with phase("cfpq_session.init"):
+            self.base = self._base_facts(
+                self.store.counts.keys(), range(self.store.num_nodes)
+            )
+            self.matrices = {
+                variable: matrix.copy() for variable, matrix in self.base.items()
+            }
+            _semi_naive_fixpoint(self.matrices, self.wcnf.variable_productions)
+
+    def add_edges(self, edges: Iterable[Edge]) -> None:
+        with phase("cfpq_session.add_edges"):
+            new_edges, new_nodes = self.store.add(edges)
+            num_nodes = self.store.num_nodes
+            for variable in self.wcnf.variables:
+                self.base[variable].resize((num_nodes, num_nodes))
+                self.matrices[variable].resize((num_nodes, num_nodes))
+
+            new_facts = self._base_facts(
+                new_edges, [self.store.node_indices[node] for node in new_nodes]
+            )
+            deltas = dict()
+            for variable, facts in new_facts.items():
+                self.base[variable] = self.base[variable] + facts
+                deltas[variable] = facts > self.matrices[variable]
+                self.matrices[variable] = self.matrices[variable] + deltas[variable]
+
+            _semi_naive_fixpoint(
+                self.matrices, self.wcnf.variable_productions, deltas=deltas
+            )
+
+    def remove_edges(self, edges: Iterable[Edge]) -> None:
+        with phase("cfpq_session.remove_edges"):
+            if len(self.store.remove(edges)) == 0:
+                return
+
+            base = self._base_facts(
+                self.store.counts.keys(), range(self.store.num_nodes)
+            )
+            lost = {
+                variable: self.base[variable] > base[variable]
+                for variable in self.wcnf.variables
+            }
+            self.base = base
+
+            overdeleted = self._overdelete(lost)
+            for variable, facts in overdeleted.items():
+                self.matrices[variable] = self.matrices[variable] > facts
+
+            rederived = self._rederive(overdeleted)
+            for variable, facts in rederived.items():
+                self.matrices[variable] = self.matrices[variable] + facts
+
+            _semi_naive_fixpoint(
+                self.matrices, self.wcnf.variable_productions, deltas=rederived
+            )
+
+    def result(self) -> TriplesResult:
+        return TriplesResult(self.matrices, self.store.nodes)
+
+    def _base_facts(
+        self, edges: Iterable[Edge], epsilon_nodes: Iterable[int]
+    ) -> Dict[Any, csr_matrix]:
+        num_nodes = self.store.num_nodes
+        indices: Dict[Any, Tuple[List[int], List[int]]] = {
+            variable: ([], []) for variable in self.wcnf.variables
+        }
+        epsilon_nodes = list(epsilon_nodes)
+        for variable in self.wcnf.epsilon_productions:
+            indices[variable][0].extend(epsilon_nodes)
+            indices[variable][1].extend(epsilon_nodes)
+
+        for v_from, v_to, label in edges:
+            for variable in self.terminal_variables.get(label, []):
+                indices[variable][0].append(self.store.node_indices[v_from])
+                indices[variable][1].append(self.store.node_indices[v_to])
+
+        return {
+            variable: _from_indices((num_nodes, num_nodes), rows, cols)
+            for variable, (rows, cols) in indices.items()
+        }
+
+    def _overdelete(self, lost: Dict[Any, csr_matrix]) -> Dict[Any, csr_matrix]:
+        # every fact with a derivation that uses a lost fact
+        result = dict(lost)
+        deltas = lost
+        while any(delta.nnz > 0 for delta in deltas.values()):
+            count_iteration("cfpq_session.overdelete", _total_nnz(result))
+            products = {
+                variable: csr_matrix(matrix.shape, dtype=bool)
+                for variable, matrix in self.matrices.items()
+            }
+            for variable, l_var, r_var in self.wcnf.variable_productions:
+                if deltas[l_var].nnz > 0:
+                    products[variable] += deltas[l_var] @ self.matrices[r_var]
+                if deltas[r_var].nnz > 0:
+                    products[variable] += self.matrices[l_var] @ deltas[r_var]
+
+            deltas = {
+                variable: product > result[variable]
+                for variable, product in products.items()
+            }
+            for variable, delta in deltas.items():
+                result[variable] = result[variable] + delta
+
+        return result
+
+    def _rederive(self, overdeleted: Dict[Any, csr_matrix]) -> Dict[Any, csr_matrix]:
+        # overdeleted facts that still follow in one step from the remaining ones
+        candidates = dict(self.base)
+        for variable, l_var, r_var in self.wcnf.variable_productions:
+            rows = np.diff(overdeleted[variable].indptr) > 0
+            if rows.any():
+                candidates[variable] = candidates[variable] + (
+                    _select_rows(self.matrices[l_var], rows) @ self.matrices[r_var]
+                )
+
+        return {
+            variable: csr_matrix(
+                candidates[variable].multiply(overdeleted[variable]), dtype=bool
+            )
+            for variable in self.wcnf.variables
+        }
+
+
+def _from_indices(shape: Tuple[int, int], rows: Any, cols: Any) -> csr_matrix:
+    return csr_matrix(
+        (
+            np.ones(len(rows), dtype=bool),
+            (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)),
+        ),
+        shape=shape,
+        dtype=bool,
+    )
@@ -0,0 +1,20 @@
+from collections import Counter
+from typing import Dict, Optional
+
+from project.instrumentation.profiler import record_iteration
+
+# number of rounds made by the fixpoint loops of the engines, keyed by loop name
+_iterations: Counter = Counter()
+
+
+def count_iteration(name: str, nnz: Optional[int] = None) -> None:
+    _iterations[name] += 1
+    record_iteration(name, nnz)
+
+
+def iteration_counts() -> Dict[str, int]:
+    return dict(_iterations)
+
+
+def reset_iteration_counts() -> None:
+    _iterations.clear()
@@ -0,0 +1,158 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import resource
+import threading
+import time
+
+
+class Profiler:
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.iterations: Counter = Counter()
+        self.nnz: Dict[str, List[int]] = defaultdict(list)
+        self.counter_events: List[Dict[str, Any]] = []
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_phase(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self.phases.append(
+                {
+                    "name": name,
+                    "start": start - self.start,
+                    "duration": end - start,
+                    "thread": threading.get_ident(),
+                    "rss_high_water_kb": _rss_high_water_kb(),
+                }
+            )
+
+    def add_iteration(self, name: str, nnz: Optional[int]) -> None:
+        with self._lock:
+            self.iterations[name] += 1
+            if nnz is not None:
+                self.nnz[name].append(int(nnz))
+                self.counter_events.append(
+                    {
+                        "name": name,
+                        "time": time.perf_counter() - self.start,
+                        "nnz": int(nnz),
+                    }
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        durations: Dict[str, Dict[str, float]] = dict()
+        for phase in self.phases:
+            total = durations.setdefault(phase["name"], {"calls": 0, "total": 0.0})
+            total["calls"] += 1
+            total["total"] += phase["duration"]
+
+        return {
+            "phases": durations,
+            "iterations": dict(self.iterations),
+            "nnz": dict(self.nnz),
+            "rss_high_water_kb": _rss_high_water_kb(),
+        }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events = [
+            {
+                "name": phase["name"],
+                "ph": "X",
+                "ts": phase["start"] * 1e6,
+                "dur": phase["duration"] * 1e6,
+                "pid": pid,
+                "tid": phase["thread"],
+                "args": {"rss_high_water_kb": phase["rss_high_water_kb"]},
+            }
+            for phase in self.phases
+        ] + [
+            {
+                "name": event["name"],
+                "ph": "C",
+                "ts": event["time"] * 1e6,
+                "pid": pid,
+                "args": {"nnz": event["nnz"]},
+            }
+            for event in self.counter_events
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(), file)
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> "_Phase":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.add_phase(self.name, self.start, time.perf_counter())
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullPhase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+_active: Optional[Profiler] = None
+
+
+def phase(name: str):
+    # a shared no-op context manager while profiling is disabled
+    if _active is None:
+        return _NULL_PHASE
+    return _Phase(_active, name)
+
+
+def record_iteration(name: str, nnz: Optional[int] = None) -> None:
+    if _active is not None:
+        _active.add_iteration(name, nnz)
+
+
+def is_enabled() -> bool:
+    return _active is not None
+
+
+def enable() -> Profiler:
+    global _active
+    _active = Profiler()
+    return _active
+
+
+def disable() -> Optional[Profiler]:
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+@contextmanager
+def profile() -> Iterator[Profiler]:
+    global _active
+    previous = _active
+    profiler = enable()
+    try:
+        yield profiler
+    finally:
+        _active = previous
+
+
+def _rss_high_water_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
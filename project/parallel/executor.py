@@ -0,0 +1,54 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+import os
+import threading
+
+
+class LabelExecutor:
+    # runs independent per-label matrix operations, e.g. kron or mxm for every label
+    # scipy releases the GIL inside its sparse kernels, so threads are the default
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None):
+        if kind not in ("serial", "thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def map(self, fn: Callable, *iterables: Iterable) -> List[Any]:
+        args = list(zip(*iterables))
+        if self.kind == "serial" or self.max_workers == 1 or len(args) <= 1:
+            return [fn(*arg) for arg in args]
+
+        return list(self._get_pool().map(fn, *zip(*args)))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "thread":
+                    self._pool = ThreadPoolExecutor(self.max_workers)
+                else:
+                    self._pool = ProcessPoolExecutor(self.max_workers)
+
+            return self._pool
+
+
+_default_executor = LabelExecutor()
+
+
+def get_executor() -> LabelExecutor:
+    return _default_executor
+
+
+def set_executor(kind: str = "thread", max_workers: Optional[int] = None) -> None:
+    global _default_executor
+    executor = LabelExecutor(kind, max_workers)
+    _default_executor.shutdown()
+    _default_executor = executor
@@ -0,0 +1,158 @@
+from collections.abc import Set as AbstractSet
+from collections import defaultdict
+from scipy.sparse import csr_matrix
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+from project.automata.backends import backend_of
+
+
+def to_csr(matrix: Any) -> csr_matrix:
+    return backend_of(matrix).to_csr(matrix)
+
+
+class PairsResult(AbstractSet):
+    # set of (v_from, v_to) pairs stored as a boolean matrix over node indices
+    def __init__(self, matrix: Any, nodes: Sequence):
+        self.matrix = to_csr(matrix)
+        self.nodes = list(nodes)
+        self._node_indices: Optional[Dict[Any, int]] = None
+
+    @classmethod
+    def _from_iterable(cls, iterable: Iterable) -> set:
+        return set(iterable)
+
+    def node_index(self, node: Any) -> Optional[int]:
+        if self._node_indices is None:
+            self._node_indices = {node: i for i, node in enumerate(self.nodes)}
+
+        try:
+            return self._node_indices.get(node)
+        except TypeError:
+            return None
+
+    def __len__(self) -> int:
+        return int(self.matrix.nnz)
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        indptr, indices = self.matrix.indptr, self.matrix.indices
+        for i in range(self.matrix.shape[0]):
+            for j in indices[indptr[i] : indptr[i + 1]]:
+                yield self.nodes[i], self.nodes[j]
+
+    def __contains__(self, pair: Any) -> bool:
+        try:
+            v_from, v_to = pair
+        except (TypeError, ValueError):
+            return False
+
+        i, j = self.node_index(v_from), self.node_index(v_to)
+        if i is None or j is None:
+            return False
+
+        return bool(self.matrix[i, j])
+
+    def __repr__(self) -> str:
+        return f"PairsResult({len(self)} pairs over {len(self.nodes)} nodes)"
+
+    def successors(self, v_from: Any) -> Iterator[Any]:
+        i = self.node_index(v_from)
+        if i is None:
+            return
+
+        indptr, indices = self.matrix.indptr, self.matrix.indices
+        for j in indices[indptr[i] : indptr[i + 1]]:
+            yield self.nodes[j]
+
+    def restrict(
+        self,
+        sources: Optional[Iterable] = None,
+        targets: Optional[Iterable] = None,
+    ) -> "PairsResult":
+        rows, cols = self.matrix.nonzero()
+        kept = np.ones(len(rows), dtype=bool)
+        if sources is not None:
+            kept &= self._indicator(sources)[rows]
+        if targets is not None:
+            kept &= self._indicator(targets)[cols]
+
+        return PairsResult(
+            csr_matrix(
+                (np.ones(kept.sum(), dtype=bool), (rows[kept], cols[kept])),
+                shape=self.matrix.shape,
+                dtype=bool,
+            ),
+            self.nodes,
+        )
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        rows, cols = self.matrix.nonzero()
+        return np.asarray(rows), np.asarray(cols)
+
+    def _indicator(self, nodes: Iterable) -> np.ndarray:
+        result = np.zeros(len(self.nodes), dtype=bool)
+        indices = [self.node_index(node) for node in nodes]
+        result[[i for i in indices if i is not None]] = True
+        return result
+
+
+class TriplesResult(AbstractSet):
+    # set of (variable, v_from, v_to) triples with a PairsResult per variable
+    def __init__(self, matrices: Dict[Any, Any], nodes: Sequence):
+        self.nodes = list(nodes)
+        self.pairs = {
+            variable: PairsResult(matrix, self.nodes)
+            for variable, matrix in matrices.items()
+        }
+
+    @classmethod
+    def _from_iterable(cls, iterable: Iterable) -> set:
+        return set(iterable)
+
+    @staticmethod
+    def from_triples(triples: Iterable, nodes: Sequence) -> "TriplesResult":
+        node_indices = {node: i for i, node in enumerate(nodes)}
+        indices: Dict[Any, Tuple[List, List]] = defaultdict(lambda: ([], []))
+        for variable, v_from, v_to in triples:
+            rows, cols = indices[variable]
+            rows.append(node_indices[v_from])
+            cols.append(node_indices[v_to])
+
+        return TriplesResult(
+            {
+                variable: csr_matrix(
+                    (np.ones(len(rows), dtype=bool), (rows, cols)),
+                    shape=(len(nodes), len(nodes)),
+                    dtype=bool,
+                )
+                for variable, (rows, cols) in indices.items()
+            },
+            nodes,
+        )
+
+    def __getitem__(self, variable: Any) -> PairsResult:
+        if variable in self.pairs:
+            return self.pairs[variable]
+
+        return PairsResult(
+            csr_matrix((len(self.nodes), len(self.nodes)), dtype=bool), self.nodes
+        )
+
+    def __len__(self) -> int:
+        return sum(len(pairs) for pairs in self.pairs.values())
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any, Any]]:
+        for variable, pairs in self.pairs.items():
+            for v_from, v_to in pairs:
+                yield variable, v_from, v_to
+
+    def __contains__(self, triple: Any) -> bool:
+        try:
+            variable, v_from, v_to = triple
+        except (TypeError, ValueError):
+            return False
+
+        return variable in self.pairs and (v_from, v_to) in self.pairs[variable]
+
+    def __repr__(self) -> str:
+        return f"TriplesResult({len(self)} triples over {len(self.nodes)} nodes)"
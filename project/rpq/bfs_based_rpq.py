@@ -1,10 +1,13 @@
-from networkx import MultiDiGraph
+from itertools import repeat
 from pyformlang.regular_expression import Regex
-from typing import Set
-import scipy.sparse as sp
+from typing import Any, Optional, Set
 
-from project.automata.utils import graph_to_nfa, regex_to_dfa
-from project.automata.decomposed_fa import DecomposedFA
+from project.automata.backends import get_backend, to_backend
+from project.cache.query_cache import query_cache
+from project.graphs.graph_store import GraphSource, decomposed_graph
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
+from project.parallel.executor import LabelExecutor, get_executor
 from project.rpq.bfs_based_rpq_helpers import (
     states_to_indices,
     create_masks,
@@ -15,48 +18,82 @@ from project.rpq.bfs_based_rpq_helpers import (
 
 
 def bfs_based_rpq(
-    graph: MultiDiGraph,
+    graph: GraphSource,
     regex: Regex,
     start_states: Set = set(),
     final_states: Set = set(),
+    executor: Optional[LabelExecutor] = None,
+    backend: str = "sparse",
 ) -> Set:
-    graph_nfa = graph_to_nfa(graph, start_states, final_states)
-    regex_dfa = regex_to_dfa(regex)
-
-    decomposed_graph = DecomposedFA.from_fa(graph_nfa)
-
-    decomposed_regex = DecomposedFA.from_fa(regex_dfa)
-    r_start_states = states_to_indices(
-        decomposed_regex.states_with_indices,
-        lambda state: state in decomposed_regex.start_states,
-    )
-    r_final_states = states_to_indices(
-        decomposed_regex.states_with_indices,
-        lambda state: state in decomposed_regex.final_states,
-    )
-
-    direct_sum = decomposed_regex.direct_sum(decomposed_graph)
-
-    mask = create_masks(decomposed_regex.num_states, decomposed_graph.num_states)
-    mask = set_start_verts(mask, start_states, r_start_states)
-
-    matrix_changed = True
-    visited = mask.copy()
-    while matrix_changed:
-        new_matrix = sp.csr_matrix(mask.shape, dtype=bool)
-        for label in direct_sum:
-            new_matrix += transform_rows(mask @ direct_sum[label])
-
-        prev_nnz = visited.nnz
-        visited += new_matrix
-
-        if prev_nnz == visited.nnz:
-            matrix_changed = False
-        else:
-            mask = new_matrix
-
-    result = set()
-    for row, col in zip(*extract_right_sub_matrix(visited).nonzero()):
-        if row in r_final_states:
-            result.add(col)
+    executor = executor or get_executor()
+    with phase("bfs_rpq.graph_to_matrices"):
+        graph_decomposed_fa = decomposed_graph(graph, start_states, final_states)
+        g_start_states = states_to_indices(
+            graph_decomposed_fa.states_with_indices, lambda state: state in start_states
+        )
+
+    with phase("bfs_rpq.regex_to_matrices"):
+        decomposed_regex = query_cache.decomposed_regex(regex)
+        r_start_states = states_to_indices(
+            decomposed_regex.states_with_indices,
+            lambda state: state in decomposed_regex.start_states,
+        )
+        r_final_states = states_to_indices(
+            decomposed_regex.states_with_indices,
+            lambda state: state in decomposed_regex.final_states,
+        )
+
+    with phase("bfs_rpq.direct_sum"):
+        direct_sum = {
+            label: to_backend(matrix, backend)
+            for label, matrix in decomposed_regex.direct_sum(
+                graph_decomposed_fa, executor
+            ).items()
+        }
+        labels = list(direct_sum.keys())
+
+    with phase("bfs_rpq.bfs"):
+        # with "auto" the label matrices are mixed but the front stays csr
+        front_backend = "sparse" if backend == "auto" else backend
+        ops = get_backend(front_backend)
+        mask = create_masks(decomposed_regex.num_states, graph_decomposed_fa.num_states)
+        mask = to_backend(
+            set_start_verts(mask, g_start_states, r_start_states), front_backend
+        )
+
+        matrix_changed = True
+        visited = ops.dup(mask)
+        while matrix_changed:
+            count_iteration("bfs_rpq", ops.nnz(visited))
+            new_matrix = ops.empty(mask.shape)
+            for step in executor.map(
+                _label_step,
+                repeat(mask),
+                [direct_sum[label] for label in labels],
+                repeat(front_backend),
+            ):
+                new_matrix = ops.ewise_add(new_matrix, step)
+
+            prev_nnz = ops.nnz(visited)
+            visited = ops.ewise_add(visited, new_matrix)
+
+            if prev_nnz == ops.nnz(visited):
+                matrix_changed = False
+            else:
+                mask = new_matrix
+
+    with phase("bfs_rpq.extract_result"):
+        nodes_by_indices = {
+            i: node for node, i in graph_decomposed_fa.states_with_indices.items()
+        }
+        result = set()
+        visited = to_backend(visited, "sparse")
+        for row, col in zip(*extract_right_sub_matrix(visited).nonzero()):
+            if row in r_final_states:
+                result.add(nodes_by_indices[col])
     return result
+
+
+def _label_step(mask: Any, matrix: Any, backend: str) -> Any:
+    front = to_backend(get_backend(backend).mxm(mask, matrix), backend)
+    return transform_rows(front, backend)
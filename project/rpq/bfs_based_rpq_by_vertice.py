@@ -1,12 +1,20 @@
 from networkx import MultiDiGraph
 from pyformlang.regular_expression import Regex
 from typing import Set, Dict, Any
+import numpy as np
 import scipy.sparse as sp
 
-from project.automata.utils import graph_to_nfa, regex_to_dfa
+from project.cache.query_cache import query_cache
 from project.automata.decomposed_fa import DecomposedFA
+from project.instrumentation.counters import count_iteration
+from project.instrumentation.profiler import phase
 from project.rpq.bfs_based_rpq_helpers import (
+    blocks_nnz,
     create_masks,
+    create_stacked_masks,
+    select_blocks,
+    set_start_verts,
+    transform_block_rows,
     transform_rows,
     extract_right_sub_matrix,
     states_to_indices,
@@ -18,36 +26,74 @@ def bfs_based_rpq_by_vertice(
     regex: Regex,
     start_states: Set = set(),
     final_states: Set = set(),
+    batched: bool = True,
 ) -> Dict:
-    graph_nfa = graph_to_nfa(graph, start_states, final_states)
-    regex_dfa = regex_to_dfa(regex)
-
-    decomposed_graph = DecomposedFA.from_fa(graph_nfa)
-    decomposed_regex = DecomposedFA.from_fa(regex_dfa)
-    r_start_states = states_to_indices(
-        decomposed_regex.states_with_indices,
-        lambda state: state in decomposed_regex.start_states,
-    )
-    r_final_states = states_to_indices(
-        decomposed_regex.states_with_indices,
-        lambda state: state in decomposed_regex.final_states,
-    )
+    with phase("bfs_rpq_by_vertice.graph_to_matrices"):
+        decomposed_graph = DecomposedFA.from_graph(graph, start_states, final_states)
+    with phase("bfs_rpq_by_vertice.regex_to_matrices"):
+        decomposed_regex = query_cache.decomposed_regex(regex)
+        r_start_states = states_to_indices(
+            decomposed_regex.states_with_indices,
+            lambda state: state in decomposed_regex.start_states,
+        )
+        r_final_states = states_to_indices(
+            decomposed_regex.states_with_indices,
+            lambda state: state in decomposed_regex.final_states,
+        )
+
+    with phase("bfs_rpq_by_vertice.direct_sum"):
+        direct_sum = decomposed_regex.direct_sum(decomposed_graph)
+
+    with phase("bfs_rpq_by_vertice.bfs"):
+        start_indices = {
+            g_state: decomposed_graph.states_with_indices[g_state]
+            for g_state in start_states
+        }
+        bfs = _batched_bfs if batched else _per_vertice_bfs
+        visited = bfs(
+            direct_sum,
+            decomposed_regex.num_states,
+            decomposed_graph.num_states,
+            start_indices,
+            r_start_states,
+        )
 
-    direct_sum = decomposed_regex.direct_sum(decomposed_graph)
+    with phase("bfs_rpq_by_vertice.extract_result"):
+        nodes_by_indices = {
+            i: node for node, i in decomposed_graph.states_with_indices.items()
+        }
+        result: Dict[Any, Set] = dict()
+        for g_state_from in start_states:
+            result[g_state_from] = set()
+            for r_state, g_state_to in zip(
+                *extract_right_sub_matrix(visited[g_state_from]).nonzero()
+            ):
+                if r_state in r_final_states:
+                    result[g_state_from].add(nodes_by_indices[g_state_to])
 
+    return result
+
+
+def _per_vertice_bfs(
+    direct_sum: Dict,
+    regex_num_states: int,
+    graph_num_states: int,
+    start_indices: Dict,
+    r_start_states: Set,
+) -> Dict:
     masks = {
-        state: create_masks(decomposed_regex.num_states, decomposed_graph.num_states)
-        for state in start_states
+        g_state: set_start_verts(
+            create_masks(regex_num_states, graph_num_states), {g_index}, r_start_states
+        )
+        for g_state, g_index in start_indices.items()
     }
-    for g_state in start_states:
-        for r_state in r_start_states:
-            masks[g_state][r_state, decomposed_regex.num_states + g_state] = True
 
     matrix_changed = True
     visited = masks.copy()
     while matrix_changed:
+        count_iteration("bfs_rpq_by_vertice")
         matrix_changed = False
-        for g_state in start_states:
+        for g_state in start_indices:
             new_matrix = sp.csr_matrix(masks[g_state].shape, dtype=bool)
             for label in direct_sum:
                 new_matrix += transform_rows(masks[g_state] @ direct_sum[label])
@@ -59,13 +105,47 @@ def bfs_based_rpq_by_vertice(
                 matrix_changed = True
                 masks[g_state] = new_matrix
 
-    result: Dict[Any, Set] = dict()
-    for g_state_from in start_states:
-        result[g_state_from] = set()
-        for r_state, g_state_to in zip(
-            *extract_right_sub_matrix(visited[g_state_from]).nonzero()
-        ):
-            if r_state in r_final_states:
-                result[g_state_from].add(g_state_to)
+    return visited
+
+
+def _batched_bfs(
+    direct_sum: Dict,
+    regex_num_states: int,
+    graph_num_states: int,
+    start_indices: Dict,
+    r_start_states: Set,
+) -> Dict:
+    # fronts of all sources stacked into blocks of regex_num_states rows
+    sources = list(start_indices.keys())
+    front = create_stacked_masks(
+        regex_num_states,
+        graph_num_states,
+        [start_indices[g_state] for g_state in sources],
+        r_start_states,
+    )
+
+    result = dict()
+    visited = front.copy()
+    while len(sources) > 0:
+        count_iteration("bfs_rpq_by_vertice.batched", visited.nnz)
+        new_front = sp.csr_matrix(front.shape, dtype=bool)
+        for label in direct_sum:
+            new_front += transform_block_rows(
+                front @ direct_sum[label], regex_num_states
+            )
+
+        prev_nnz = blocks_nnz(visited, regex_num_states)
+        visited = visited + new_front
+        changed = blocks_nnz(visited, regex_num_states) != prev_nnz
+
+        for block in np.flatnonzero(~changed):
+            result[sources[block]] = select_blocks(
+                visited, np.array([block]), regex_num_states
+            )
+
+        active = np.flatnonzero(changed)
+        front = select_blocks(new_front, active, regex_num_states)
+        visited = select_blocks(visited, active, regex_num_states)
+        sources = [sources[block] for block in active]
 
     return result
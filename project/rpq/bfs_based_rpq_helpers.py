@@ -1,9 +1,12 @@
-from typing import Set, Dict, Callable
+from typing import Any, Set, Callable, List, Mapping
+import numpy as np
 import scipy.sparse as sp
 
+from project.automata.backends import get_backend
+
 
 def states_to_indices(
-    states_with_indices: Dict, filter: Callable = lambda _: True
+    states_with_indices: Mapping, filter: Callable = lambda _: True
 ) -> Set:
     return {index for state, index in states_with_indices.items() if filter(state)}
 
@@ -23,11 +26,20 @@ def set_start_verts(
     mask_matrix: sp.csr_matrix, start_states: Set, regex_start_states: Set
 ) -> sp.csr_matrix:
     regex_num_states = mask_matrix.shape[0]
-    for row in range(regex_num_states):
-        if row in regex_start_states:
-            for col in start_states:
-                mask_matrix[row, regex_num_states + col] = True
-    return mask_matrix
+    rows = np.repeat(
+        np.fromiter(regex_start_states, dtype=np.int64, count=len(regex_start_states)),
+        len(start_states),
+    )
+    cols = regex_num_states + np.tile(
+        np.fromiter(start_states, dtype=np.int64, count=len(start_states)),
+        len(regex_start_states),
+    )
+    start_verts = sp.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=mask_matrix.shape,
+        dtype=bool,
+    )
+    return mask_matrix + start_verts
 
 
 def extract_left_sub_matrix(mask_matrix: sp.csr_matrix) -> sp.csr_matrix:
@@ -38,17 +50,70 @@ def extract_right_sub_matrix(mask_matrix: sp.csr_matrix) -> sp.csr_matrix:
     return mask_matrix[:, mask_matrix.shape[0] :]
 
 
-def transform_rows(mask_matrix: sp.csr_matrix) -> sp.csr_matrix:
-    t = extract_left_sub_matrix(mask_matrix)
-    i_row, i_col = t.nonzero()
+def transform_rows(mask_matrix: Any, backend: str = "sparse") -> Any:
+    # row i of the front moves to row j for every (i, j) in its left block
+    ops = get_backend(backend)
+    regex_num_states = mask_matrix.shape[0]
+    rows, cols = ops.to_lists(mask_matrix)
+    left = cols < regex_num_states
+    permutation = ops.from_lists(
+        (regex_num_states, regex_num_states), cols[left], rows[left]
+    )
+    return ops.mxm(permutation, mask_matrix)
 
-    result = sp.csr_matrix(mask_matrix.shape, dtype=bool)
-    for col in range(len(i_col)):
-        row = mask_matrix.getrow(i_row[col])
-        result[i_col[col], :] += row
 
-    return result
+def reduce_vector(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    return sp.csr_matrix(matrix.sum(axis=0) > 0)
 
 
-def reduce_vector(matrix: sp.csr_matrix) -> sp.csr_matrix:
-    return sum(matrix.getrow(row) for row in range(matrix.shape[0]))
+def create_stacked_masks(
+    regex_num_states: int,
+    graph_num_states: int,
+    start_states: List[int],
+    regex_start_states: Set,
+) -> sp.csr_matrix:
+    num_blocks = len(start_states)
+    r_start_states = np.fromiter(
+        regex_start_states, dtype=np.int64, count=len(regex_start_states)
+    )
+    blocks = np.arange(num_blocks, dtype=np.int64)
+
+    # identity in the left part of every block
+    eye_rows = np.arange(num_blocks * regex_num_states, dtype=np.int64)
+    eye_cols = eye_rows % regex_num_states
+
+    # start vertice of block b in the right part of its regex start rows
+    start_rows = (blocks[:, None] * regex_num_states + r_start_states).ravel()
+    start_cols = regex_num_states + np.repeat(
+        np.array(start_states, dtype=np.int64), len(r_start_states)
+    )
+
+    rows = np.concatenate([eye_rows, start_rows])
+    cols = np.concatenate([eye_cols, start_cols])
+    return sp.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=(num_blocks * regex_num_states, regex_num_states + graph_num_states),
+        dtype=bool,
+    )
+
+
+def transform_block_rows(mask_matrix: sp.csr_matrix, block_size: int) -> sp.csr_matrix:
+    # transform_rows applied to each block of block_size rows independently
+    rows, cols = mask_matrix[:, :block_size].nonzero()
+    permutation = sp.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows - rows % block_size + cols, rows)),
+        shape=(mask_matrix.shape[0], mask_matrix.shape[0]),
+        dtype=bool,
+    )
+    return permutation @ mask_matrix
+
+
+def blocks_nnz(matrix: sp.csr_matrix, block_size: int) -> np.ndarray:
+    return np.asarray(np.diff(matrix.indptr).reshape(-1, block_size).sum(axis=1))
+
+
+def select_blocks(
+    matrix: sp.csr_matrix, blocks: np.ndarray, block_size: int
+) -> sp.csr_matrix:
+    rows = (blocks[:, None] * block_size + np.arange(block_size)).ravel()
+    return matrix[rows]
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from networkx import MultiDiGraph
+from pyformlang.regular_expression import Regex
+from typing import Any, Dict, Iterator, List, Set, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+from project.automata.decomposed_fa import DecomposedFA, indicator, state_indices
+from project.cache.query_cache import query_cache
+from project.instrumentation.counters import count_iteration
+
+
+def multi_source_rpq(
+    graph: MultiDiGraph,
+    regex: Regex,
+    start_states: Set = set(),
+    final_states: Set = set(),
+) -> Iterator[Tuple[Any, Any]]:
+    decomposed_graph = DecomposedFA.from_graph(graph, start_states, final_states)
+    decomposed_regex = query_cache.decomposed_regex(regex)
+
+    nodes = list(decomposed_graph.states_with_indices.keys())
+    sources = state_indices(
+        decomposed_graph.states_with_indices, decomposed_graph.start_states
+    )
+    is_final = indicator(
+        state_indices(
+            decomposed_graph.states_with_indices, decomposed_graph.final_states
+        ),
+        decomposed_graph.num_states,
+    )
+    r_start_states = state_indices(
+        decomposed_regex.states_with_indices, decomposed_regex.start_states
+    )
+    r_final_states = set(
+        state_indices(
+            decomposed_regex.states_with_indices, decomposed_regex.final_states
+        ).tolist()
+    )
+
+    # regex transitions grouped by the front they are applied to
+    transitions: Dict[Tuple[int, Any], List[int]] = defaultdict(list)
+    for label in decomposed_regex.matrices.keys() & decomposed_graph.matrices.keys():
+        for r_from, r_to in zip(*decomposed_regex.matrices[label].nonzero()):
+            transitions[(r_from, label)].append(r_to)
+
+    # fronts[r][i, v] is set when sources[i] reaches v with the regex in state r
+    shape = (len(sources), decomposed_graph.num_states)
+    start_front = sp.csr_matrix(
+        (np.ones(len(sources), dtype=bool), (np.arange(len(sources)), sources)),
+        shape=shape,
+        dtype=bool,
+    )
+    fronts = {r_state: start_front for r_state in r_start_states.tolist()}
+    visited: Dict[int, sp.csr_matrix] = dict()
+    answers = sp.csr_matrix(shape, dtype=bool)
+
+    while len(fronts) > 0:
+        count_iteration("multi_source_rpq", answers.nnz)
+        new_fronts: Dict[int, sp.csr_matrix] = dict()
+        for (r_from, label), r_states_to in transitions.items():
+            if r_from not in fronts:
+                continue
+
+            product = fronts[r_from] @ decomposed_graph.matrices[label]
+            for r_to in r_states_to:
+                if r_to in new_fronts:
+                    new_fronts[r_to] = new_fronts[r_to] + product
+                else:
+                    new_fronts[r_to] = product
+
+        fronts = dict()
+        for r_state, front in new_fronts.items():
+            if r_state in visited:
+                front = front > visited[r_state]
+                visited[r_state] = visited[r_state] + front
+            else:
+                visited[r_state] = front
+            if front.nnz == 0:
+                continue
+
+            fronts[r_state] = front
+
+            if r_state in r_final_states:
+                new_answers = front > answers
+                answers += new_answers
+                idx_from, idx_to = new_answers.nonzero()
+                accepted = is_final[idx_to]
+                for i, v_to in zip(
+                    idx_from[accepted].tolist(), idx_to[accepted].tolist()
+                ):
+                    yield nodes[sources[i]], nodes[v_to]
@@ -1,31 +1,73 @@
-from networkx import MultiDiGraph
 from pyformlang.regular_expression import Regex
-from typing import Set, Dict
+from typing import Set
 
-from project.automata.utils import graph_to_nfa, regex_to_dfa
-from project.automata.decomposed_fa import DecomposedFA
-import scipy.sparse as sp
+from project.cache.query_cache import query_cache
+from project.automata.decomposed_fa import (
+    DecomposedFA,
+    indicator,
+    state_indices,
+)
+from project.graphs.graph_store import GraphSource, decomposed_graph
+from project.instrumentation.profiler import phase
+from project.results.results import PairsResult
+from scipy.sparse import csr_matrix
+import numpy as np
 
 
 def rpq(
-    graph: MultiDiGraph,
+    graph: GraphSource,
     regex: Regex,
     start_states: Set = set(),
     final_states: Set = set(),
-) -> Set:
-    graph_decomposed_fa = DecomposedFA.from_fa(
-        graph_to_nfa(graph, start_states, final_states)
-    )
-    regex_decomposed_fa = DecomposedFA.from_fa(regex_to_dfa(regex))
+) -> PairsResult:
+    with phase("rpq.graph_to_matrices"):
+        graph_decomposed_fa = decomposed_graph(graph, start_states, final_states)
+    with phase("rpq.regex_to_matrices"):
+        regex_decomposed_fa = query_cache.decomposed_regex(regex)
 
-    intersection = graph_decomposed_fa.intersect(regex_decomposed_fa)
-    transitive_closure = intersection.transitive_closure()
+    with phase("rpq.intersect"):
+        intersection = graph_decomposed_fa.intersect(
+            regex_decomposed_fa, reachable_only=True
+        )
+    with phase("rpq.transitive_closure"):
+        transitive_closure = intersection.transitive_closure()
 
-    return set(
-        (
-            s_from // regex_decomposed_fa.num_states,
-            s_to // regex_decomposed_fa.num_states,
+    with phase("rpq.extract_result"):
+        return _extract_result(
+            intersection, transitive_closure, graph_decomposed_fa, regex_decomposed_fa
         )
-        for s_from, s_to in zip(*transitive_closure.nonzero())
-        if s_from in intersection.start_states and s_to in intersection.final_states
+
+
+def _extract_result(
+    intersection: DecomposedFA,
+    transitive_closure: csr_matrix,
+    graph_decomposed_fa: DecomposedFA,
+    regex_decomposed_fa: DecomposedFA,
+) -> PairsResult:
+    # intersection states are indices of the full product of the automata
+    states = np.empty(intersection.num_states, dtype=np.int64)
+    states[list(intersection.states_with_indices.values())] = list(
+        intersection.states_with_indices.keys()
+    )
+    is_start = indicator(
+        state_indices(intersection.states_with_indices, intersection.start_states),
+        intersection.num_states,
+    )
+    is_final = indicator(
+        state_indices(intersection.states_with_indices, intersection.final_states),
+        intersection.num_states,
+    )
+
+    idx_from, idx_to = transitive_closure.nonzero()
+    accepted = is_start[idx_from] & is_final[idx_to]
+    g_from = states[idx_from[accepted]] // regex_decomposed_fa.num_states
+    g_to = states[idx_to[accepted]] // regex_decomposed_fa.num_states
+
+    return PairsResult(
+        csr_matrix(
+            (np.ones(len(g_from), dtype=bool), (g_from, g_to)),
+            shape=(graph_decomposed_fa.num_states, graph_decomposed_fa.num_states),
+            dtype=bool,
+        ),
+        list(graph_decomposed_fa.states_with_indices.keys()),
     )
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from pyformlang.finite_automaton import NondeterministicFiniteAutomaton
+
+from project.automata.backends import (
+    MatrixBackend,
+    backend_of,
+    get_backend,
+    to_backend,
+)
+from project.automata.cb_decomposed_fa import CbDecomposedFA
+from project.automata.bit_matrix import BitMatrix
+
+backends = ["sparse", "dense", "cubool", "cubool_emulated"]
+
+
+def random_matrix(shape, density, seed):
+    return sp.random(*shape, density=density, format="csr", random_state=seed).astype(
+        bool
+    )
+
+
+def convert(backend, matrix):
+    return backend.from_lists(matrix.shape, *matrix.nonzero())
+
+
+def as_array(backend, matrix):
+    return backend.to_csr(matrix).toarray()
+
+
+@pytest.mark.parametrize("name", backends)
+def test_operations(name):
+    backend = get_backend(name)
+    left, right, other = (random_matrix((7, 7), 0.2, seed) for seed in range(3))
+    b_left, b_right, b_other = (convert(backend, m) for m in (left, right, other))
+
+    assert backend.owns(b_left)
+    assert backend_of(b_left) is backend
+    assert backend.nnz(b_left) == left.nnz
+    assert backend.nnz(backend.empty((3, 4))) == 0
+    assert np.array_equal(as_array(backend, backend.identity(3)), np.eye(3, dtype=bool))
+    assert set(backend.iterate(b_left)) == set(zip(*left.nonzero()))
+    assert np.array_equal(
+        as_array(backend, backend.mxm(b_left, b_right)), (left @ right).toarray()
+    )
+    assert np.array_equal(
+        as_array(
+            backend,
+            backend.mxm(b_left, b_right, out=backend.dup(b_other), accumulate=True),
+        ),
+        (other + left @ right).toarray(),
+    )
+    assert np.array_equal(
+        as_array(backend, backend.ewise_add(b_left, b_right)), (left + right).toarray()
+    )
+    assert np.array_equal(
+        as_array(backend, backend.difference(b_left, b_right)), (left > right).toarray()
+    )
+    assert np.array_equal(
+        as_array(backend, backend.kron(b_left, b_right)),
+        sp.kron(left, right).toarray(),
+    )
+    assert np.array_equal(
+        as_array(backend, backend.block_diag(b_left, convert(backend, other[:3, :5]))),
+        sp.block_diag((left, other[:3, :5])).toarray(),
+    )
+
+
+@pytest.mark.parametrize("source", backends)
+@pytest.mark.parametrize("target", backends)
+def test_to_backend(source, target):
+    matrix = random_matrix((5, 9), 0.3, 4)
+    converted = to_backend(convert(get_backend(source), matrix), target)
+
+    assert get_backend(target).owns(converted)
+    assert np.array_equal(as_array(get_backend(target), converted), matrix.toarray())
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend("no_such_backend")
+
+
+def test_matrix_backend_is_abstract():
+    with pytest.raises(TypeError):
+        MatrixBackend()
+
+
+def test_cubool_backend_names():
+    assert get_backend("cubool").name == "cubool"
+    assert not get_backend("cubool").emulated
+    assert get_backend("cubool_emulated").emulated
+
+
+def test_cb_decomposed_fa():
+    nfa = NondeterministicFiniteAutomaton()
+    nfa.add_transitions([(0, "a", 1), (1, "b", 0)])
+    decomposed_fa = CbDecomposedFA.from_fa(nfa)
+
+    assert decomposed_fa.backend is get_backend("cubool")
+    assert decomposed_fa.backend.nnz(decomposed_fa.matrices["a"]) == 1
+
+
+@pytest.mark.parametrize("name", ["sparse", "dense"])
+def test_mixed_kron_stays_sparse(name):
+    backend = get_backend(name)
+    left, right = random_matrix((30, 30), 0.05, 0), random_matrix((5, 5), 0.5, 1)
+
+    result = backend.kron(left, BitMatrix.from_matrix(right))
+    assert sp.issparse(result)
+    assert np.array_equal(result.toarray(), sp.kron(left, right).toarray())
+    assert isinstance(
+        backend.kron(BitMatrix.from_matrix(left), BitMatrix.from_matrix(right)),
+        BitMatrix,
+    )
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from project.automata.backends import to_backend
+from project.automata.bit_matrix import BitMatrix, kron
+
+
+def random_matrix(shape, density, seed):
+    return sp.random(*shape, density=density, format="csr", random_state=seed).astype(
+        bool
+    )
+
+
+@pytest.mark.parametrize(
+    "m, k, n", [(1, 1, 1), (5, 70, 3), (130, 65, 129), (0, 3, 2), (3, 0, 2)]
+)
+def test_operations(m, k, n):
+    left = random_matrix((m, k), 0.2, 1)
+    right = random_matrix((k, n), 0.2, 2)
+    other = random_matrix((m, k), 0.2, 3)
+    bit_left, bit_right = BitMatrix.from_matrix(left), BitMatrix.from_matrix(right)
+
+    assert bit_left.nnz == left.nnz
+    assert (bit_left.tocsr() != left).nnz == 0
+    assert np.array_equal((bit_left @ bit_right).to_dense(), (left @ right).toarray())
+    assert np.array_equal((left @ bit_right).to_dense(), (left @ right).toarray())
+    assert np.array_equal((bit_left + other).to_dense(), (left + other).toarray())
+    assert np.array_equal((bit_left > other).to_dense(), (left > other).toarray())
+    assert np.array_equal((other > bit_left).to_dense(), (other > left).toarray())
+    assert np.array_equal(bit_left.T.to_dense(), left.T.toarray())
+    assert np.array_equal(
+        kron(bit_left, bit_right).to_dense(), sp.kron(left, right).toarray()
+    )
+
+
+def test_to_backend():
+    sparse = random_matrix((100, 100), 0.01, 1)
+    dense = random_matrix((100, 100), 0.2, 1)
+
+    assert isinstance(to_backend(dense), BitMatrix)
+    assert not isinstance(to_backend(sparse), BitMatrix)
+    assert isinstance(to_backend(sparse, "dense"), BitMatrix)
+    assert not isinstance(to_backend(to_backend(dense), "sparse"), BitMatrix)
+    with pytest.raises(ValueError):
+        to_backend(sparse, "no_such_backend")
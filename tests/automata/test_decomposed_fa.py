@@ -1,8 +1,12 @@
 import pytest
+from networkx import MultiDiGraph
 from pyformlang.finite_automaton import NondeterministicFiniteAutomaton
+from pyformlang.cfg import Variable
 from scipy.sparse import csr_matrix
 
+from project.automata.bit_matrix import BitMatrix
 from project.automata.decomposed_fa import DecomposedFA
+from project.automata.rsm import RecursiveStateMachine
 
 
 def test_conversions_empty():
@@ -19,24 +23,27 @@ def test_conversions():
     assert nfa == DecomposedFA.from_fa(nfa).to_fa()
 
 
-def test_intersect_empty():
+@pytest.mark.parametrize("reachable_only", [False, True])
+def test_intersect_empty(reachable_only):
     nfa = NondeterministicFiniteAutomaton()
     decomposed_nfa = DecomposedFA.from_fa(nfa)
 
-    assert nfa == decomposed_nfa.intersect(decomposed_nfa).to_fa()
+    assert nfa == decomposed_nfa.intersect(decomposed_nfa, reachable_only).to_fa()
 
 
-def test_trivial_intersect():
+@pytest.mark.parametrize("reachable_only", [False, True])
+def test_trivial_intersect(reachable_only):
     nfa = NondeterministicFiniteAutomaton()
     nfa.add_transitions([(0, "a", 1), (0, "b", 0), (1, "b", 0), (1, "a", 1)])
     nfa.add_start_state(0)
     nfa.add_final_state(1)
 
     decomposed_nfa = DecomposedFA.from_fa(nfa)
-    assert nfa == decomposed_nfa.intersect(decomposed_nfa).to_fa()
+    assert nfa == decomposed_nfa.intersect(decomposed_nfa, reachable_only).to_fa()
 
 
-def test_intersect():
+@pytest.mark.parametrize("reachable_only", [False, True])
+def test_intersect(reachable_only):
     left_nfa = NondeterministicFiniteAutomaton()
     left_nfa.add_transitions([(0, "a", 0), (0, "a", 1)])
     left_nfa.add_start_state(0)
@@ -55,12 +62,13 @@ def test_intersect():
     assert (
         expected_nfa
         == DecomposedFA.from_fa(left_nfa)
-        .intersect(DecomposedFA.from_fa(right_nfa))
+        .intersect(DecomposedFA.from_fa(right_nfa), reachable_only)
         .to_fa()
     )
 
 
-def test_intersect_with_parallel_edges():
+@pytest.mark.parametrize("reachable_only", [False, True])
+def test_intersect_with_parallel_edges(reachable_only):
     left_nfa = NondeterministicFiniteAutomaton()
     left_nfa.add_transitions([(0, "a", 0), (0, "a", 1), (0, "b", 1)])
     left_nfa.add_start_state(0)
@@ -79,27 +87,53 @@ def test_intersect_with_parallel_edges():
     assert (
         expected_nfa
         == DecomposedFA.from_fa(left_nfa)
-        .intersect(DecomposedFA.from_fa(right_nfa))
+        .intersect(DecomposedFA.from_fa(right_nfa), reachable_only)
         .to_fa()
     )
 
 
-def test_transitive_closure_empty():
+def test_reachable_intersect():
+    left_nfa = NondeterministicFiniteAutomaton()
+    left_nfa.add_transitions([(0, "a", 1), (2, "a", 3)])
+    left_nfa.add_start_state(0)
+    left_nfa.add_final_state(1)
+    left_nfa.add_final_state(3)
+
+    right_nfa = NondeterministicFiniteAutomaton()
+    right_nfa.add_transitions([(0, "a", 1)])
+    right_nfa.add_start_state(0)
+    right_nfa.add_final_state(1)
+
+    left, right = DecomposedFA.from_fa(left_nfa), DecomposedFA.from_fa(right_nfa)
+    full = left.intersect(right)
+    reachable = left.intersect(right, reachable_only=True)
+
+    assert full.num_states == 8
+    assert reachable.num_states == 2
+    assert reachable.start_states == full.start_states
+    assert reachable.final_states < full.final_states
+    assert reachable.matrices["a"].nnz == 1
+
+
+@pytest.mark.parametrize("strategy", ["squaring", "frontier"])
+def test_transitive_closure_empty(strategy):
     decomposed_fa = DecomposedFA()
 
-    assert decomposed_fa.transitive_closure().sum() == 0
+    assert decomposed_fa.transitive_closure(strategy).sum() == 0
 
 
-def test_trivial_transitive_closure():
+@pytest.mark.parametrize("strategy", ["squaring", "frontier"])
+def test_trivial_transitive_closure(strategy):
     nfa = NondeterministicFiniteAutomaton()
     nfa.add_transition(0, "a", 0)
     nfa.add_start_state(0)
     nfa.add_final_state(0)
 
-    assert DecomposedFA.from_fa(nfa).transitive_closure().sum() == 1
+    assert DecomposedFA.from_fa(nfa).transitive_closure(strategy).sum() == 1
 
 
-def test_transitive_closure():
+@pytest.mark.parametrize("strategy", ["squaring", "frontier"])
+def test_transitive_closure(strategy):
     nfa = NondeterministicFiniteAutomaton()
     nfa.add_transitions(
         [(0, "a", 0), (0, "a", 1), (0, "b", 1), (1, "b", 2), (2, "a", 2)]
@@ -107,7 +141,23 @@ def test_transitive_closure():
     nfa.add_start_state(0)
     nfa.add_final_state(1)
 
-    assert DecomposedFA.from_fa(nfa).transitive_closure().sum() == 5
+    assert DecomposedFA.from_fa(nfa).transitive_closure(strategy).sum() == 5
+
+
+def test_transitive_closure_long_chain():
+    nfa = NondeterministicFiniteAutomaton()
+    nfa.add_transitions([(i, "a", i + 1) for i in range(16)])
+    decomposed_fa = DecomposedFA.from_fa(nfa)
+
+    squaring = decomposed_fa.transitive_closure("squaring")
+    frontier = decomposed_fa.transitive_closure("frontier")
+    assert squaring.sum() == 17 * 16 // 2
+    assert (squaring != frontier).nnz == 0
+
+
+def test_transitive_closure_unknown_strategy():
+    with pytest.raises(ValueError):
+        DecomposedFA().transitive_closure("no_such_strategy")
 
 
 def test_direct_sum_empty():
@@ -156,3 +206,65 @@ def test_direct_sum():
     assert direct_sum.keys() == {"a", "b"}
     assert (direct_sum["a"].toarray() != a_matrix).sum() == 0
     assert (direct_sum["b"].toarray() != b_matrix).sum() == 0
+
+
+def test_from_rsm():
+    rsm = RecursiveStateMachine.from_ecfg_text("S -> a S b | $")
+    decomposed_rsm = DecomposedFA.from_rsm(rsm)
+
+    assert decomposed_rsm.matrices.keys() == {"a", "b", "S"}
+    assert decomposed_rsm.num_states == len(rsm.automata[Variable("S")].states)
+    assert all(matrix.sum() == 1 for matrix in decomposed_rsm.matrices.values())
+
+
+def test_from_graph():
+    graph = MultiDiGraph(
+        [
+            ("x", "y", {"label": "a"}),
+            ("y", "z", {"label": "b"}),
+            ("y", "z", {"label": "a"}),
+            ("z", "x", {"label": "a"}),
+        ]
+    )
+    decomposed_graph = DecomposedFA.from_graph(graph, {"x"})
+
+    assert decomposed_graph.num_states == 3
+    assert decomposed_graph.start_states == {"x"}
+    assert decomposed_graph.final_states == {"x", "y", "z"}
+    assert decomposed_graph.matrices.keys() == {"a", "b"}
+    assert decomposed_graph.matrices["a"].sum() == 3
+    assert decomposed_graph.matrices["b"].sum() == 1
+
+    y, z = (
+        decomposed_graph.states_with_indices["y"],
+        decomposed_graph.states_with_indices["z"],
+    )
+    assert decomposed_graph.matrices["b"][y, z]
+
+
+@pytest.mark.parametrize("strategy", ["squaring", "frontier"])
+@pytest.mark.parametrize("backend", ["dense", "auto"])
+def test_transitive_closure_backend(strategy, backend):
+    nfa = NondeterministicFiniteAutomaton()
+    nfa.add_transitions(
+        [(0, "a", 0), (0, "a", 1), (0, "b", 1), (1, "b", 2), (2, "a", 2)]
+    )
+    decomposed_nfa = DecomposedFA.from_fa(nfa)
+
+    assert (
+        decomposed_nfa.transitive_closure(strategy, backend).nnz
+        == decomposed_nfa.transitive_closure(strategy).nnz
+        == 5
+    )
+
+
+def test_with_backend_intersect():
+    nfa = NondeterministicFiniteAutomaton()
+    nfa.add_transitions([(0, "a", 1), (0, "b", 0), (1, "b", 0), (1, "a", 1)])
+    nfa.add_start_state(0)
+    nfa.add_final_state(1)
+
+    dense_nfa = DecomposedFA.from_fa(nfa).with_backend("dense")
+    assert all(isinstance(m, BitMatrix) for m in dense_nfa.matrices.values())
+    assert nfa == dense_nfa.intersect(dense_nfa).to_fa()
+    assert nfa == dense_nfa.intersect(dense_nfa, reachable_only=True).to_fa()
@@ -6,6 +6,9 @@ from pyformlang.finite_automaton import NondeterministicFiniteAutomaton
 from project.rpq.rpq import rpq
 from project.rpq.bfs_based_rpq import bfs_based_rpq
 from project.rpq.bfs_based_rpq_by_vertice import bfs_based_rpq_by_vertice
+from project.rpq.multi_source_rpq import multi_source_rpq
+
+backends = ["sparse", "dense", "auto", "cubool", "cubool_emulated"]
 
 
 def test_rpq_empty():
@@ -35,7 +38,40 @@ def test_rpq():
     assert rpq(graph, regex, {0, 1}, {2}) == {(0, 2), (1, 2)}
 
 
-def test_bfs_based_rpq1():
+def test_rpq_named_vertices():
+    regex = Regex("a.b*")
+    graph = MultiDiGraph(
+        [
+            ("z", "x", {"label": "a"}),
+            ("x", "y", {"label": "b"}),
+            ("y", "x", {"label": "c"}),
+        ]
+    )
+
+    assert rpq(graph, regex, {"z"}) == {("z", "x"), ("z", "y")}
+    assert bfs_based_rpq(graph, regex, {"z"}) == {"x", "y"}
+    assert bfs_based_rpq_by_vertice(graph, regex, {"z"}) == {"z": {"x", "y"}}
+
+
+def test_multi_source_rpq():
+    regex = Regex("(a|b)*b(a|b)")
+    graph = MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 1, {"label": "b"}),
+            (1, 2, {"label": "b"}),
+            (2, 3, {"label": "c"}),
+        ]
+    )
+
+    answers = list(multi_source_rpq(graph, regex, {0, 1}, {2}))
+    assert len(answers) == 2
+    assert set(answers) == rpq(graph, regex, {0, 1}, {2}) == {(0, 2), (1, 2)}
+    assert set(multi_source_rpq(graph, regex, {2})) == set()
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_bfs_based_rpq1(backend):
     regex = Regex("b*a.b")
     graph = MultiDiGraph(
         [
@@ -47,10 +83,11 @@ def test_bfs_based_rpq1():
         ]
     )
 
-    assert bfs_based_rpq(graph, regex, {0}, {}) == {2}
+    assert bfs_based_rpq(graph, regex, {0}, {}, backend=backend) == {2}
 
 
-def test_bfs_based_rpq2():
+@pytest.mark.parametrize("backend", backends)
+def test_bfs_based_rpq2(backend):
     regex = Regex("(a|b)*b(a|b)")
     graph = MultiDiGraph(
         [
@@ -61,10 +98,11 @@ def test_bfs_based_rpq2():
         ]
     )
 
-    assert bfs_based_rpq(graph, regex, {0, 1}, {2}) == {1, 2}
+    assert bfs_based_rpq(graph, regex, {0, 1}, {2}, backend=backend) == {1, 2}
 
 
-def test_bfs_based_rpq_by_vertice1():
+@pytest.mark.parametrize("batched", [True, False])
+def test_bfs_based_rpq_by_vertice1(batched):
     regex = Regex("b*a.b")
     graph = MultiDiGraph(
         [
@@ -76,10 +114,11 @@ def test_bfs_based_rpq_by_vertice1():
         ]
     )
 
-    assert bfs_based_rpq_by_vertice(graph, regex, {0}, {}) == {0: {2}}
+    assert bfs_based_rpq_by_vertice(graph, regex, {0}, {}, batched) == {0: {2}}
 
 
-def test_bfs_based_rpq_by_vertice2():
+@pytest.mark.parametrize("batched", [True, False])
+def test_bfs_based_rpq_by_vertice2(batched):
     regex = Regex("(a|b)*b(a|b)")
     graph = MultiDiGraph(
         [
@@ -90,4 +129,7 @@ def test_bfs_based_rpq_by_vertice2():
         ]
     )
 
-    assert bfs_based_rpq_by_vertice(graph, regex, {0, 1}, {2}) == {0: {1, 2}, 1: {1, 2}}
+    assert bfs_based_rpq_by_vertice(graph, regex, {0, 1}, {2}, batched) == {
+        0: {1, 2},
+        1: {1, 2},
+    }
@@ -0,0 +1,67 @@
+import json
+import pytest
+
+from project.benchmarks.benchmark import (
+    CFPQ_ENGINES,
+    RPQ_ENGINES,
+    BenchmarkCase,
+    run_benchmarks,
+    write_results,
+)
+from project.benchmarks.graphs import (
+    chain_graph,
+    random_labeled_graph,
+    rdf_like_graph,
+    two_cycles_graph,
+)
+
+
+def test_graphs():
+    assert two_cycles_graph(2, 3).number_of_edges() == 7
+    assert chain_graph(4).number_of_edges() == 4
+    assert set(label for _, _, label in chain_graph(4).edges(data="label")) == {
+        "a",
+        "b",
+    }
+
+    graph = random_labeled_graph(10, 30, seed=1)
+    assert graph.number_of_nodes() == 10 and graph.number_of_edges() == 30
+    assert sorted(graph.edges(data="label")) == sorted(
+        random_labeled_graph(10, 30, seed=1).edges(data="label")
+    )
+
+    rdf = rdf_like_graph(5, 10)
+    assert rdf.number_of_edges() == 2 * (4 + 10)
+    assert set(label for _, _, label in rdf.edges(data="label")) == {
+        "subClassOf",
+        "subClassOf_r",
+        "type",
+        "type_r",
+    }
+
+
+@pytest.mark.parametrize("isolate", [False, True])
+def test_run_benchmarks(isolate, tmp_path):
+    case = BenchmarkCase("chain", chain_graph(6), ["a.b"], ["S -> a S b | a b"])
+    measurements = run_benchmarks(
+        [case],
+        {"rpq": RPQ_ENGINES["rpq"]},
+        {name: CFPQ_ENGINES[name] for name in ["hellings", "mprod_based_algorithm"]},
+        repeats=2,
+        isolate=isolate,
+    )
+
+    assert [m.engine for m in measurements] == [
+        "rpq",
+        "hellings",
+        "mprod_based_algorithm",
+    ]
+    assert [m.result_size for m in measurements] == [3, 3, 3]
+    assert all(len(m.times) == 2 and m.peak_rss_kb > 0 for m in measurements)
+    assert measurements[2].iterations["mprod.semi_naive"] > 0
+
+    path = tmp_path / "results.json"
+    write_results(measurements, str(path))
+    report = json.loads(path.read_text())
+    assert len(report["measurements"]) == 3
+    assert report["measurements"][0]["engine"] == "rpq"
@@ -0,0 +1,92 @@
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG, Production, Terminal, Variable
+from pyformlang.regular_expression import Regex
+
+from project.cache.query_cache import (
+    BoundedCache,
+    QueryCache,
+    cfg_key,
+    query_cache,
+    regex_key,
+)
+from project.rpq.rpq import rpq
+
+
+def test_bounded_cache_lru():
+    cache = BoundedCache(maxsize=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    assert cache.get_or_compute("a", lambda: 3) == 1
+
+    cache.get_or_compute("c", lambda: 4)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.evictions) == (1, 3, 1)
+
+
+def test_bounded_cache_fifo():
+    cache = BoundedCache(maxsize=2, policy="fifo")
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 3)
+    cache.get_or_compute("c", lambda: 4)
+
+    assert "a" not in cache
+    assert len(cache) == 2
+
+
+def test_bounded_cache_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedCache(policy="no_such_policy")
+
+
+def test_cfg_key_is_canonical():
+    assert cfg_key(CFG.from_text("S -> a S b\nS -> $")) == cfg_key(
+        CFG.from_text("S -> $\nS -> a S b")
+    )
+    assert cfg_key(CFG.from_text("S -> a")) != cfg_key(CFG.from_text("S -> b"))
+
+
+def test_cfg_key_keeps_symbols_apart():
+    single = CFG(
+        {Variable("S")},
+        {Terminal("a b")},
+        Variable("S"),
+        {Production(Variable("S"), [Terminal("a b")])},
+    )
+    assert cfg_key(single) != cfg_key(CFG.from_text("S -> a b"))
+
+
+def test_regex_key_keeps_empty_apart():
+    assert regex_key(Regex("a+")) != regex_key(Regex("a|Empty"))
+    assert regex_key(Regex("a*.b")) == regex_key(Regex("a* b"))
+
+
+def test_cached_rpq_is_not_shared_between_regexes():
+    graph = MultiDiGraph(
+        [(0, 1, {"label": "a"}), (1, 2, {"label": "a"}), (2, 3, {"label": "Empty"})]
+    )
+    expected = rpq(graph, Regex("a|Empty"))
+
+    query_cache.clear()
+    rpq(graph, Regex("a+"))
+    assert rpq(graph, Regex("a|Empty")) == expected
+    assert (2, 3) in expected
+
+
+def test_query_cache():
+    cache = QueryCache()
+    first = cache.decomposed_regex(Regex("a*.b"))
+    second = cache.decomposed_regex(Regex("a* b"))
+
+    assert first is second
+    assert cache.stats.hits == 1
+
+    wcnf = cache.wcnf_productions(CFG.from_text("S -> a S b | $"))
+    assert wcnf.epsilon_productions == {Variable("S")}
+    assert cache.wcnf_productions(CFG.from_text("S -> $ | a S b")) is wcnf
+
+    cache.clear()
+    assert len(cache.cache) == 0
+    assert cache.stats.hits == 0
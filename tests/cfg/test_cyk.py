@@ -0,0 +1,56 @@
+import itertools
+import pytest
+from pyformlang.cfg import CFG
+
+from project.cfg.cfg import cfg_to_cyk_tables
+from project.cfg.cyk import cyk, cyk_batch, cyk_file
+
+grammars = [
+    "S -> a S b | $",
+    "S -> a S b S | $",
+    "S -> A B\nA -> a | a A\nB -> b B | $",
+    "S -> S S | a S b | c",
+    "S -> a S",
+]
+
+
+@pytest.mark.parametrize("cfg", grammars)
+def test_cyk(cfg):
+    cfg = CFG.from_text(cfg)
+    for length in range(6):
+        for word in itertools.product("abc", repeat=length):
+            assert cyk(cfg, "".join(word)) == cfg.contains("".join(word))
+
+
+def test_cyk_tokens():
+    cfg = CFG.from_text(
+        "\n".join(f"S -> A{i} B{i}\nA{i} -> open{i}\nB{i} -> close" for i in range(40))
+    )
+    tables = cfg_to_cyk_tables(cfg)
+
+    assert len(tables.variables) > 64
+    assert cyk(tables, ["open39", "close"])
+    assert not cyk(tables, ["open39", "open39"])
+    assert not cyk(tables, ["unknown"])
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_cyk_batch(max_workers):
+    cfg = CFG.from_text("S -> a S b | $")
+    words = ["a" * i + "b" * j for i in range(6) for j in range(6)] * 2
+
+    assert cyk_batch(cfg, words, max_workers, chunk_size=4) == [
+        cfg.contains(word) for word in words
+    ]
+
+
+def test_cyk_file(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("ab\naabb\naab\n\n")
+
+    assert cyk_file(CFG.from_text("S -> a S b | $"), str(path)) == [
+        True,
+        True,
+        False,
+        True,
+    ]
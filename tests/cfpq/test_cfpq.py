@@ -1,21 +1,45 @@
 import pytest
+from functools import partial, wraps
 from typing import Set
 from pyformlang.cfg import CFG, Production, Variable, Terminal
 from networkx import MultiDiGraph
 
-from project.cfpq.hellings import hellings
-from project.cfpq.matrix_prod import mprod_based_algorithm, cb_mprod_based_algorithm
-from project.cfpq.tensor import tensor_based, cb_tensor_based
+from project.cfpq.hellings import hellings, indexed_hellings
+from project.cfpq.matrix_prod import (
+    mprod_based_algorithm,
+    multi_source_mprod_based_algorithm,
+    cb_mprod_based_algorithm,
+)
+from project.cfpq.tensor import (
+    tensor_based,
+    cb_tensor_based,
+    incremental_tensor_based,
+)
 from project.cfpq.cfpq import cfpq
+from project.cfpq.engines import is_source_aware, source_aware
+from project.cfpq.gll import gll_based
+from project.cfpq.sharded_cfpq import sharded_cfpq
+from project.graphs.labeled_graph import LabeledGraph
 
 
 @pytest.fixture(
     params=[
         hellings,
+        indexed_hellings,
         mprod_based_algorithm,
+        multi_source_mprod_based_algorithm,
+        gll_based,
         tensor_based,
+        incremental_tensor_based,
         cb_mprod_based_algorithm,
         cb_tensor_based,
+        partial(mprod_based_algorithm, semi_naive=False),
+        partial(mprod_based_algorithm, backend="dense"),
+        partial(mprod_based_algorithm, semi_naive=False, backend="auto"),
+        partial(cb_mprod_based_algorithm, semi_naive=False),
+        partial(mprod_based_algorithm, backend="cubool_emulated"),
+        partial(tensor_based, backend="cubool_emulated"),
+        partial(tensor_based, backend="dense"),
     ]
 )
 def algorithm(request):
@@ -111,8 +135,9 @@ test_cfgs = [
         ],
     ),
 )
-def test_hellings(graph: MultiDiGraph, cfg: CFG, expected: Set):
-    assert hellings(graph, cfg) == expected
+@pytest.mark.parametrize("hellings_algorithm", [hellings, indexed_hellings])
+def test_hellings(hellings_algorithm, graph: MultiDiGraph, cfg: CFG, expected: Set):
+    assert hellings_algorithm(graph, cfg) == expected
 
 
 @pytest.mark.parametrize(
@@ -125,3 +150,96 @@ def test_hellings(graph: MultiDiGraph, cfg: CFG, expected: Set):
 )
 def test_cfpq(algorithm, graph: MultiDiGraph, cfg: CFG, expected: Set):
     assert cfpq(graph, cfg, algorithm=algorithm) == expected
+
+
+def test_cfpq_named_vertices(algorithm):
+    graph = MultiDiGraph(
+        [
+            ("x", "y", {"label": "a"}),
+            ("y", "z", {"label": "b"}),
+        ]
+    )
+    cfg = CFG.from_text("S -> a S b | $")
+
+    assert cfpq(graph, cfg, algorithm=algorithm) == {
+        ("x", "x"),
+        ("y", "y"),
+        ("z", "z"),
+        ("x", "z"),
+    }
+
+
+@pytest.mark.parametrize(
+    "graph, cfg, expected",
+    zip(
+        test_graphs,
+        test_cfgs,
+        [set(), {(0, 2), (0, 3)}, {(1, 3), (0, 2), (2, 3), (1, 2), (0, 3), (2, 2)}],
+    ),
+)
+@pytest.mark.parametrize(
+    "sharded_algorithm",
+    [
+        multi_source_mprod_based_algorithm,
+        gll_based,
+        mprod_based_algorithm,
+        tensor_based,
+    ],
+)
+def test_sharded_cfpq(sharded_algorithm, graph: MultiDiGraph, cfg: CFG, expected: Set):
+    assert (
+        sharded_cfpq(graph, cfg, sharded_algorithm, block_size=1, max_workers=2)
+        == expected
+    )
+    assert sharded_cfpq(
+        graph, cfg, sharded_algorithm, start_vertices={1}, final_vertices={3}
+    ) == {pair for pair in expected if pair == (1, 3)}
+
+
+@pytest.mark.parametrize("graph, cfg", zip(test_graphs, test_cfgs))
+@pytest.mark.parametrize("start_vertices", [{0}, {1, 2}, {3}])
+@pytest.mark.parametrize(
+    "multi_source_algorithm", [multi_source_mprod_based_algorithm, gll_based]
+)
+def test_multi_source_cfpq(
+    multi_source_algorithm, graph: MultiDiGraph, cfg: CFG, start_vertices: Set
+):
+    expected = cfpq(graph, cfg, mprod_based_algorithm, start_vertices=start_vertices)
+    assert (
+        cfpq(graph, cfg, multi_source_algorithm, start_vertices=start_vertices)
+        == expected
+    )
+
+
+@pytest.mark.parametrize("graph, cfg", zip(test_graphs, test_cfgs))
+def test_cfpq_labeled_graph(algorithm, graph: MultiDiGraph, cfg: CFG):
+    assert cfpq(LabeledGraph.from_networkx(graph), cfg, algorithm=algorithm) == cfpq(
+        graph, cfg, algorithm=algorithm
+    )
+
+
+def test_is_source_aware():
+    @wraps(gll_based)
+    def wrapper(*args, **kwargs):
+        return gll_based(*args, **kwargs)
+
+    assert is_source_aware(multi_source_mprod_based_algorithm)
+    assert is_source_aware(partial(gll_based, start_variable=Variable("S")))
+    assert is_source_aware(wrapper)
+    assert not is_source_aware(mprod_based_algorithm)
+    assert not is_source_aware(partial(mprod_based_algorithm, semi_naive=False))
+
+
+def test_cfpq_passes_sources_to_wrapped_engines():
+    calls = []
+
+    @source_aware
+    def engine(graph, cfg, start_vertices, start_variable):
+        calls.append(start_vertices)
+        return multi_source_mprod_based_algorithm(
+            graph, cfg, start_vertices, start_variable
+        )
+
+    graph, cfg = test_graphs[1], test_cfgs[1]
+    assert cfpq(graph, cfg, partial(engine), start_vertices={0}) == {(0, 2), (0, 3)}
+    assert calls == [{0}]
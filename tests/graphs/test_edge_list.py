@@ -0,0 +1,87 @@
+import pytest
+import cfpq_data
+import numpy as np
+
+from project.graphs.edge_list import edge_list_info, iter_edge_chunks, read_edge_list
+from project.graphs.labeled_graph import LabeledGraph
+
+lines = [f"{i} {(i * 7) % 50} {'ab'[i % 2]}" for i in range(100)]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "graph.csv"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, 1 << 20])
+def test_iter_edge_chunks(csv_path, chunk_size):
+    chunks = list(iter_edge_chunks(csv_path, chunk_size))
+
+    assert (len(chunks) > 1) == (chunk_size < 1 << 20)
+    assert [" ".join(edge) for chunk in chunks for edge in zip(*chunk)] == lines
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, 1 << 20])
+def test_read_edge_list(csv_path, chunk_size):
+    expected = cfpq_data.graph_from_csv(csv_path)
+    graph = LabeledGraph(*read_edge_list(csv_path, chunk_size))
+
+    assert set(graph.nodes) == set(expected.nodes)
+    assert sorted(graph.edges(data="label")) == sorted(expected.edges(data="label"))
+    assert all(isinstance(node, int) for node in graph.nodes)
+
+
+def test_read_edge_list_tokens(tmp_path):
+    path = tmp_path / "graph.csv"
+    path.write_text("x 1 a\n\n1 01 NA\n")
+    nodes, labels, sources, targets, edge_labels = read_edge_list(str(path), 4)
+
+    assert nodes == ["x", "1", 1]
+    assert labels == ["a", "NA"]
+    assert sources.tolist() == [0, 1]
+    assert targets.tolist() == [2, 2]
+    assert edge_labels.tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1 << 20])
+def test_read_edge_list_converts_columns(tmp_path, chunk_size):
+    path = tmp_path / "graph.csv"
+    path.write_text("1 2 a\n01 3 b\n2 1 a\n")
+    expected = cfpq_data.graph_from_csv(str(path))
+    graph = LabeledGraph(*read_edge_list(str(path), chunk_size))
+
+    assert graph.number_of_nodes() == expected.number_of_nodes() == 3
+    assert sorted(graph.edges(data="label")) == sorted(expected.edges(data="label"))
+    assert edge_list_info(str(path), chunk_size)[0] == 3
+
+
+def test_read_empty_edge_list(tmp_path):
+    path = tmp_path / "graph.csv"
+    path.write_text("")
+    nodes, labels, sources, targets, edge_labels = read_edge_list(str(path))
+
+    assert nodes == [] and labels == []
+    assert len(sources) == len(targets) == len(edge_labels) == 0
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1 << 20])
+def test_edge_list_info(csv_path, chunk_size):
+    graph = cfpq_data.graph_from_csv(csv_path)
+
+    assert edge_list_info(csv_path, chunk_size) == (
+        graph.number_of_nodes(),
+        graph.number_of_edges(),
+        set(cfpq_data.get_sorted_labels(graph)),
+    )
+
+
+def test_label_matrices(csv_path):
+    matrices = LabeledGraph.from_csv(csv_path, chunk_size=64).label_matrices()
+
+    assert matrices.keys() == {"a", "b"}
+    assert sum(matrix.nnz for matrix in matrices.values()) == len(lines)
+    assert matrices["a"].nnz == sum(line.endswith("a") for line in lines)
+    assert matrices["b"].nnz == sum(line.endswith("b") for line in lines)
+    assert np.all([matrix.shape == (100, 100) for matrix in matrices.values()])
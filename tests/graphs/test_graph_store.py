@@ -0,0 +1,120 @@
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from pyformlang.regular_expression import Regex
+import cfpq_data
+import numpy as np
+
+from project.cfpq.cfpq import cfpq
+from project.cfpq.hellings import hellings
+from project.cfpq.matrix_prod import mprod_based_algorithm
+from project.cfpq.tensor import tensor_based
+from project.graphs.graph_store import GraphStore, graph_hash
+from project.rpq.bfs_based_rpq import bfs_based_rpq
+from project.rpq.rpq import rpq
+
+test_graph = MultiDiGraph(
+    [
+        ("x", "y", {"label": "a"}),
+        ("y", "z", {"label": "b"}),
+        ("y", "z", {"label": "b"}),
+        ("z", "x", {"label": "a"}),
+    ]
+)
+
+
+def test_graph_hash():
+    other_graph = MultiDiGraph(test_graph)
+    assert graph_hash(test_graph) == graph_hash(other_graph)
+
+    other_graph.add_edge("x", "z", label="c")
+    assert graph_hash(test_graph) != graph_hash(other_graph)
+
+
+def test_save_load(tmp_path):
+    store = GraphStore(str(tmp_path))
+    key = store.save(test_graph)
+
+    assert store.contains(key)
+    assert store.save(test_graph) == key
+
+    decomposed_graph = store.load(key, {"x"})
+    assert decomposed_graph.num_states == 3
+    assert decomposed_graph.start_states == {"x"}
+    assert decomposed_graph.final_states == {"x", "y", "z"}
+    assert decomposed_graph.matrices.keys() == {"a", "b"}
+
+    y = decomposed_graph.states_with_indices["y"]
+    z = decomposed_graph.states_with_indices["z"]
+    assert decomposed_graph.matrices["b"].nnz == 1
+    assert decomposed_graph.matrices["b"][y, z]
+
+    meta = store.load_meta(key)
+    assert meta["num_edges"] == 4
+
+
+def test_load_missing(tmp_path):
+    with pytest.raises(KeyError):
+        GraphStore(str(tmp_path)).load("no_such_key")
+
+
+def test_load_csv(tmp_path):
+    path = cfpq_data.graph_to_csv(test_graph, tmp_path / "graph.csv")
+    store = GraphStore(str(tmp_path / "store"))
+
+    decomposed_graph = store.load_csv(str(path))
+    assert decomposed_graph.num_states == 3
+    assert decomposed_graph.matrices["a"].nnz == 2
+    assert store.save_csv(str(path)) == store.save_csv(str(path))
+
+
+def test_graph_hash_is_order_independent():
+    other_graph = MultiDiGraph()
+    other_graph.add_nodes_from(reversed(list(test_graph.nodes)))
+    other_graph.add_edges_from(reversed(list(test_graph.edges(data=True))))
+    assert graph_hash(test_graph) == graph_hash(other_graph)
+
+
+def test_num_edges_skips_unlabeled(tmp_path):
+    graph = MultiDiGraph(test_graph)
+    graph.add_edge("x", "z")
+
+    store = GraphStore(str(tmp_path))
+    assert store.load_meta(store.save(graph))["num_edges"] == 4
+
+
+def test_load_maps_indices(tmp_path):
+    store = GraphStore(str(tmp_path))
+    matrix = store.load(store.save(test_graph)).matrices["a"]
+
+    # csr_matrix keeps views of the mapped arrays
+    array = matrix.indices
+    while not isinstance(array, np.memmap) and isinstance(array, np.ndarray):
+        array = array.base
+    assert isinstance(array, np.memmap)
+
+
+def test_queries_on_stored_graph(tmp_path):
+    store = GraphStore(str(tmp_path))
+    key = store.save(test_graph)
+    regex = Regex("a.b")
+
+    expected = rpq(test_graph, regex, {"x"})
+    assert rpq((store, key), regex, {"x"}) == expected == {("x", "z")}
+    assert rpq(store.load(key), regex, {"x"}) == expected
+
+    expected = bfs_based_rpq(test_graph, regex, {"x"})
+    assert bfs_based_rpq((store, key), regex, {"x"}) == expected == {"z"}
+    assert bfs_based_rpq(store.load(key), regex, {"x"}) == expected
+
+
+@pytest.mark.parametrize("algorithm", [hellings, mprod_based_algorithm, tensor_based])
+def test_cfpq_on_stored_graph(tmp_path, algorithm):
+    store = GraphStore(str(tmp_path))
+    key = store.save(test_graph)
+    cfg = CFG.from_text("S -> a S b | a b")
+
+    expected = cfpq(test_graph, cfg, algorithm)
+    assert cfpq((store, key), cfg, algorithm) == expected
+    assert cfpq(store.load(key), cfg, algorithm) == expected
+    assert expected == {("x", "z")}
@@ -0,0 +1,95 @@
+import pytest
+from networkx import MultiDiGraph, is_isomorphic
+import numpy as np
+from pyformlang.regular_expression import Regex
+
+from project.automata.decomposed_fa import DecomposedFA
+from project.graphs.labeled_graph import LabeledGraph, edges_by_label
+from project.rpq.rpq import rpq
+
+test_graph = MultiDiGraph(
+    [
+        ("x", "y", {"label": "a"}),
+        ("y", "z", {"label": "b"}),
+        ("y", "z", {"label": "b"}),
+        ("z", "x", {"label": "a"}),
+    ]
+)
+test_graph.add_node("w")
+
+
+def test_from_networkx():
+    graph = LabeledGraph.from_networkx(test_graph)
+
+    assert graph.nodes == ["x", "y", "z", "w"]
+    assert graph.labels == ["a", "b"]
+    assert graph.number_of_edges() == 4
+    assert sorted(graph.edges(data="label")) == sorted(test_graph.edges(data="label"))
+    assert graph.edge_labels.dtype == np.int16
+    assert list(graph.label_offsets) == [0, 2, 4]
+
+
+def test_networkx_round_trip():
+    graph = LabeledGraph.from_networkx(test_graph).to_networkx()
+
+    assert list(graph.nodes) == list(test_graph.nodes)
+    assert is_isomorphic(graph, test_graph, edge_match=lambda x, y: x == y)
+
+
+def test_csv_round_trip(tmp_path):
+    path = str(tmp_path / "graph.csv")
+    LabeledGraph.from_networkx(MultiDiGraph(test_graph.edges(data=True))).to_csv(path)
+    graph = LabeledGraph.from_csv(path)
+
+    assert set(graph.nodes) == {"x", "y", "z"}
+    assert sorted(graph.edges(data="label")) == sorted(test_graph.edges(data="label"))
+
+
+def test_label_matrix():
+    graph = LabeledGraph.from_networkx(test_graph)
+    matrix = graph.label_matrix("b")
+
+    assert matrix.shape == (4, 4)
+    assert matrix.nnz == 1
+    assert matrix[1, 2]
+    assert graph.label_matrix("c").nnz == 0
+
+
+def test_edges_by_label():
+    expected = edges_by_label(test_graph)
+    actual = edges_by_label(LabeledGraph.from_networkx(test_graph))
+
+    assert expected.keys() == actual.keys()
+    for label, (rows, cols) in expected.items():
+        assert sorted(zip(rows.tolist(), cols.tolist())) == sorted(
+            zip(actual[label][0].tolist(), actual[label][1].tolist())
+        )
+
+
+def test_subgraph():
+    graph = LabeledGraph.from_networkx(test_graph).subgraph(np.array([0, 1, 3]))
+
+    assert graph.nodes == ["x", "y", "w"]
+    assert list(graph.edges(data="label")) == [("x", "y", "a")]
+
+
+def test_edges_data():
+    with pytest.raises(ValueError):
+        list(LabeledGraph.from_networkx(test_graph).edges(data="weight"))
+
+
+def test_from_graph():
+    decomposed_graph = DecomposedFA.from_graph(
+        LabeledGraph.from_networkx(test_graph), {"x"}
+    )
+
+    assert decomposed_graph.states_with_indices == {"x": 0, "y": 1, "z": 2, "w": 3}
+    assert decomposed_graph.start_states == {"x"}
+    assert decomposed_graph.final_states == {"x", "y", "z", "w"}
+    assert decomposed_graph.matrices.keys() == {"a", "b"}
+    assert decomposed_graph.matrices["b"].nnz == 1
+
+
+@pytest.mark.parametrize("regex", [Regex("a b"), Regex("(a b b)*"), Regex("a*")])
+def test_rpq(regex):
+    assert rpq(LabeledGraph.from_networkx(test_graph), regex) == rpq(test_graph, regex)
@@ -0,0 +1,66 @@
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from pyformlang.regular_expression import Regex
+
+from project.cfpq.hellings import hellings
+from project.incremental.sessions import CfpqSession, RpqSession
+from project.rpq.rpq import rpq
+
+batches = [
+    ("add", [(0, 1, "a"), (1, 2, "b")]),
+    ("add", [(2, 3, "a"), (3, 4, "b"), (1, 2, "b")]),
+    ("remove", [(1, 2, "b")]),
+    ("remove", [(1, 2, "b"), (0, 1, "a")]),
+    ("add", [(4, 0, "a"), (0, 5, "b"), (5, 5, "a")]),
+    ("remove", [(3, 4, "b")]),
+]
+
+
+def apply(graph, session, kind, edges):
+    if kind == "add":
+        for v_from, v_to, label in edges:
+            graph.add_edge(v_from, v_to, label=label)
+        session.add_edges(edges)
+    else:
+        for v_from, v_to, label in edges:
+            key = next(
+                key
+                for key, data in graph.get_edge_data(v_from, v_to).items()
+                if data["label"] == label
+            )
+            graph.remove_edge(v_from, v_to, key)
+        session.remove_edges(edges)
+
+
+@pytest.mark.parametrize("regex", ["a*b", "(a.b)*", "a|b.b*"])
+@pytest.mark.parametrize("start_states, final_states", [(set(), set()), ({0, 2}, {4})])
+def test_rpq_session(regex, start_states, final_states):
+    graph = MultiDiGraph()
+    graph.add_node(0)
+    session = RpqSession(graph, Regex(regex), start_states, final_states)
+
+    for kind, edges in batches:
+        apply(graph, session, kind, edges)
+        assert session.result() == rpq(graph, Regex(regex), start_states, final_states)
+
+
+@pytest.mark.parametrize(
+    "cfg", ["S -> a S b | a b", "S -> a S b S | $", "S -> A B\nA -> a | a A\nB -> b"]
+)
+def test_cfpq_session(cfg):
+    cfg = CFG.from_text(cfg)
+    graph = MultiDiGraph()
+    session = CfpqSession(graph, cfg)
+
+    for kind, edges in batches:
+        apply(graph, session, kind, edges)
+        assert session.result() == hellings(graph, cfg)
+
+
+def test_remove_missing_edge():
+    session = RpqSession(MultiDiGraph([(0, 1, {"label": "a"})]), Regex("a"))
+
+    with pytest.raises(KeyError):
+        session.remove_edges([(0, 1, "a"), (0, 1, "a")])
+    assert session.result() == {(0, 1)}
@@ -0,0 +1,78 @@
+import json
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from pyformlang.regular_expression import Regex
+
+from project.cache.query_cache import query_cache
+from project.cfpq.cfpq import cfpq
+from project.cfpq.matrix_prod import mprod_based_algorithm
+from project.instrumentation import profiler
+from project.rpq.rpq import rpq
+
+graph = MultiDiGraph(
+    [
+        (0, 1, {"label": "a"}),
+        (1, 2, {"label": "b"}),
+        (2, 3, {"label": "a"}),
+        (3, 0, {"label": "b"}),
+    ]
+)
+
+
+def test_disabled():
+    assert not profiler.is_enabled()
+    assert profiler.phase("a") is profiler.phase("b")
+    profiler.record_iteration("loop", 1)
+
+
+def test_profile_rpq():
+    query_cache.clear()
+    with profiler.profile() as stats_profiler:
+        assert profiler.is_enabled()
+        rpq(graph, Regex("(a.b)*"))
+    assert not profiler.is_enabled()
+
+    stats = stats_profiler.stats()
+    for name in [
+        "rpq.graph_to_matrices",
+        "rpq.regex_to_matrices",
+        "rpq.intersect",
+        "rpq.transitive_closure",
+        "rpq.extract_result",
+        "compile.regex_dfa",
+    ]:
+        assert stats["phases"][name]["calls"] == 1
+    assert stats["iterations"]["closure.squaring"] == len(
+        stats["nnz"]["closure.squaring"]
+    )
+    assert stats["rss_high_water_kb"] > 0
+
+
+def test_profile_cfpq(tmp_path):
+    with profiler.profile() as stats_profiler:
+        cfpq(graph, CFG.from_text("S -> a S b | a b"), mprod_based_algorithm)
+
+    stats = stats_profiler.stats()
+    assert {"mprod.init", "mprod.fixpoint", "mprod.extract_result"} <= set(
+        stats["phases"]
+    )
+    nnz = stats["nnz"]["mprod.semi_naive"]
+    assert nnz == sorted(nnz)
+
+    path = tmp_path / "trace.json"
+    stats_profiler.write_chrome_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert {"X", "C"} == {event["ph"] for event in events}
+    assert all(event["dur"] >= 0 for event in events if event["ph"] == "X")
+
+
+def test_nested_profile():
+    with profiler.profile() as outer:
+        with profiler.profile() as inner:
+            with profiler.phase("inner"):
+                pass
+        with profiler.phase("outer"):
+            pass
+
+    assert set(inner.stats()["phases"]) == {"inner"}
+    assert set(outer.stats()["phases"]) == {"outer"}
@@ -0,0 +1,74 @@
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.finite_automaton import NondeterministicFiniteAutomaton
+from pyformlang.regular_expression import Regex
+
+from project.automata.decomposed_fa import DecomposedFA
+from project.parallel.executor import LabelExecutor, get_executor, set_executor
+from project.rpq.bfs_based_rpq import bfs_based_rpq
+
+
+def _add(left, right):
+    return left + right
+
+
+@pytest.mark.parametrize("kind", ["serial", "thread", "process"])
+def test_map(kind):
+    executor = LabelExecutor(kind, 2)
+    assert executor.map(_add, [1, 2, 3], [10, 20, 30]) == [11, 22, 33]
+    assert executor.map(_add, [], []) == []
+    executor.shutdown()
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        LabelExecutor("no_such_kind")
+
+
+def test_set_executor():
+    default = get_executor()
+    set_executor("serial")
+    assert get_executor().kind == "serial"
+    set_executor(default.kind, default.max_workers)
+    assert get_executor().kind == default.kind
+
+
+@pytest.mark.parametrize("kind", ["serial", "thread", "process"])
+@pytest.mark.parametrize("reachable_only", [False, True])
+def test_intersect_and_direct_sum(kind, reachable_only):
+    nfa = NondeterministicFiniteAutomaton()
+    nfa.add_transitions(
+        [(0, "a", 1), (1, "b", 2), (2, "c", 0), (1, "a", 1), (2, "b", 2)]
+    )
+    nfa.add_start_state(0)
+    nfa.add_final_state(2)
+    decomposed_nfa = DecomposedFA.from_fa(nfa)
+
+    executor = LabelExecutor(kind, 2)
+    expected = decomposed_nfa.intersect(
+        decomposed_nfa, reachable_only, LabelExecutor("serial")
+    )
+    actual = decomposed_nfa.intersect(decomposed_nfa, reachable_only, executor)
+    assert expected.to_fa() == actual.to_fa()
+
+    expected_sum = decomposed_nfa.direct_sum(decomposed_nfa, LabelExecutor("serial"))
+    actual_sum = decomposed_nfa.direct_sum(decomposed_nfa, executor)
+    assert expected_sum.keys() == actual_sum.keys()
+    for label in expected_sum:
+        assert (expected_sum[label] != actual_sum[label]).nnz == 0
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("kind", ["serial", "thread", "process"])
+def test_bfs_based_rpq(kind):
+    graph = MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 1, {"label": "b"}),
+            (1, 2, {"label": "b"}),
+            (2, 3, {"label": "c"}),
+        ]
+    )
+    executor = LabelExecutor(kind, 2)
+    assert bfs_based_rpq(graph, Regex("(a|b)*b(a|b)"), {0, 1}, {2}, executor) == {1, 2}
+    executor.shutdown()
@@ -0,0 +1,48 @@
+import pytest
+import pycubool as pcb
+from scipy.sparse import csr_matrix
+
+from project.results.results import PairsResult, TriplesResult
+
+nodes = ["x", "y", "z"]
+matrix = csr_matrix([[0, 1, 1], [0, 0, 1], [0, 0, 0]], dtype=bool)
+
+
+@pytest.mark.parametrize(
+    "pairs",
+    [
+        PairsResult(matrix, nodes),
+        PairsResult(pcb.Matrix.from_lists((3, 3), [0, 0, 1], [1, 2, 2]), nodes),
+    ],
+)
+def test_pairs_result(pairs):
+    assert len(pairs) == 3
+    assert pairs == {("x", "y"), ("x", "z"), ("y", "z")}
+    assert ("x", "z") in pairs
+    assert ("z", "x") not in pairs
+    assert ("w", "x") not in pairs
+    assert set(pairs.successors("x")) == {"y", "z"}
+    assert list(pairs.successors("w")) == []
+
+
+def test_pairs_result_restrict():
+    pairs = PairsResult(matrix, nodes)
+
+    assert pairs.restrict({"y"}) == {("y", "z")}
+    assert pairs.restrict(targets={"y"}) == {("x", "y")}
+    assert pairs.restrict({"x"}, {"z"}) == {("x", "z")}
+
+    rows, cols = pairs.restrict({"x"}).to_arrays()
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 1), (0, 2)]
+
+
+def test_triples_result():
+    expected = {("A", "x", "y"), ("A", "y", "z"), ("B", "z", "z")}
+    triples = TriplesResult.from_triples(expected, nodes)
+
+    assert len(triples) == 3
+    assert triples == expected
+    assert ("B", "z", "z") in triples
+    assert ("C", "z", "z") not in triples
+    assert triples["A"] == {("x", "y"), ("y", "z")}
+    assert len(triples["C"]) == 0